@@ -1,14 +1,49 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, Response, stream_with_context, has_request_context, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from itertools import chain, islice
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, configure_mappers
+from werkzeug.middleware.proxy_fix import ProxyFix
+import click
+import codecs
+import csv
+import gzip
+import hashlib
+import math
+import multiprocessing
 import os
+import queue
+import re
 import secrets
+import sqlite3
+import threading
+import time
 
 
 # Email functionality removed for simplicity
 import json
 
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+try:
+    import redis
+except ImportError:  # only needed for a shared rate limit store
+    redis = None
+
+try:
+    import numpy
+except ImportError:  # only needed for `flask fraud backtest`
+    numpy = None
+
 app = Flask(__name__)
 
 # Configuration
@@ -21,12 +56,51 @@ if database_url:
     if database_url.startswith('postgres://'):
         database_url = database_url.replace('postgres://', 'postgresql://', 1)
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    # Pool sized for the worker class in gunicorn.conf.py; gevent workers
+    # multiplex many requests per process and need a larger pool
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_pre_ping': True,
+        'pool_recycle': 300
+    }
 else:
     # Development: SQLite
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(basedir, "banking.db")}'
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# SQLite only: WAL and tuned pragmas, BEGIN IMMEDIATE for writes and a
+# group-commit writer for money-moving routes (see SQLite Concurrency below)
+app.config['SQLITE_HIGH_CONCURRENCY'] = os.environ.get('SQLITE_HIGH_CONCURRENCY', '1').lower() in ('1', 'true', 'yes')
+# NORMAL is crash-safe in WAL mode but can lose the last commits on power loss; FULL syncs every commit
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000))
+app.config['TRANSACTION_ARCHIVE_DIR'] = os.environ.get('TRANSACTION_ARCHIVE_DIR', os.path.join(basedir, 'archive'))
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+# Bearer token for downstream consumers of /api/outbox/events (admins can use their session)
+app.config['OUTBOX_FEED_TOKEN'] = os.environ.get('OUTBOX_FEED_TOKEN')
+# Longest ?wait= long poll on the feed. A sync gunicorn worker (the default in
+# gunicorn.conf.py) serves one request at a time, so it only waits briefly
+app.config['OUTBOX_MAX_WAIT_SECONDS'] = float(os.environ.get(
+    'OUTBOX_MAX_WAIT_SECONDS',
+    30 if (os.environ.get('GUNICORN_WORKER_CLASS', 'sync') in ('gevent', 'gthread')
+           or int(os.environ.get('GUNICORN_THREADS', 1)) > 1) else 2))
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1').lower() in ('1', 'true', 'yes')
+# memory:// (per worker process) or redis://host:port/db (shared by all workers)
+app.config['RATE_LIMIT_STORAGE_URL'] = os.environ.get('RATE_LIMIT_STORAGE_URL', 'memory://')
+
+# Account cache: none, redis://host:port/db (shared by all workers) or
+# memory:// (LRU per process; single-worker and tests only, since other
+# workers never see its invalidations; gunicorn.conf.py refuses it otherwise)
+app.config['CACHE_URL'] = os.environ.get('CACHE_URL', 'none')
+app.config['CACHE_TTL_SECONDS'] = int(os.environ.get('CACHE_TTL_SECONDS', 60))
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+
+# Number of reverse proxies in front of the app (1 on Render), so the client
+# IP used for rate limiting comes from X-Forwarded-For
+trusted_proxies = int(os.environ.get('TRUSTED_PROXIES', 0))
+if trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
 
 db = SQLAlchemy(app)
 bcrypt = Bcrypt(app)
@@ -108,6 +182,8 @@ class Transaction(db.Model):
     customer = db.relationship('Customer', foreign_keys=[customer_id])
     related_customer = db.relationship('Customer', foreign_keys=[related_customer_id])
     
+    __table_args__ = (db.Index('ix_transaction_customer_created', 'customer_id', 'created_at'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -221,50 +297,238 @@ class ContactMessage(db.Model):
             'message': self.message,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
         }
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # send_otp_email, fraud_alert, record_login
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(20), default='pending')  # pending, running, failed; done jobs are deleted
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=5)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_by = db.Column(db.String(32))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_job_status_run_at', 'status', 'run_at'),)
+
+class OutboxEvent(db.Model):
+    __tablename__ = 'outbox_event'
+    id = db.Column(db.Integer, primary_key=True)  # feed cursor
+    aggregate = db.Column(db.String(20), nullable=False)  # transaction, deposit, loan, fraud_alert
+    aggregate_id = db.Column(db.Integer, nullable=False)
+    event_type = db.Column(db.String(10), nullable=False)  # created, updated, deleted
+    payload = db.Column(db.Text, nullable=False)  # JSON of the row's to_dict()
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TransactionRollup(db.Model):
+    __tablename__ = 'transaction_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(4), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    customer_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = bank-wide
+    transaction_type = db.Column(db.String(20), nullable=False)  # deposit, withdraw, transfer, * = all
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    alert_count = db.Column(db.Integer, nullable=False, default=0)  # only on * rows
+    
+    __table_args__ = (db.UniqueConstraint('granularity', 'customer_id', 'transaction_type', 'bucket_start',
+                                          name='uq_transaction_rollup_bucket'),)
+    
+    def to_dict(self):
+        return {
+            'bucket_start': self.bucket_start.strftime('%Y-%m-%d %H:%M:%S'),
+            'granularity': self.granularity,
+            'customer_id': self.customer_id or None,
+            'transaction_type': self.transaction_type,
+            'transaction_count': self.transaction_count,
+            'total_amount': self.total_amount,
+            'alert_count': self.alert_count,
+            # Alerts are only counted on the all-types rows
+            'alert_rate': round(self.alert_count / self.transaction_count, 4)
+                          if self.transaction_count and self.transaction_type == '*' else None
+        }
+
+# JSON Serialization
+# List endpoints select plain column rows instead of hydrating ORM objects and
+# build the same dicts as the models' to_dict(). Timestamps are formatted a
+# column at a time per chunk of rows.
+def format_datetime(value):
+    """Same output as strftime('%Y-%m-%d %H:%M:%S') for naive datetimes"""
+    return value.isoformat(' ', 'seconds')
+
+CUSTOMER_FIELDS = (
+    ('id', Customer.id, None),
+    ('user_id', Customer.user_id, None),
+    ('account_number', Customer.account_number, None),
+    ('first_name', Customer.first_name, None),
+    ('last_name', Customer.last_name, None),
+    ('email', Customer.email, None),
+    ('phone', Customer.phone, None),
+    ('balance', Customer.balance, None),
+    ('account_status', Customer.account_status, None),
+    ('kyc_verified', Customer.kyc_verified, None),
+    ('created_at', Customer.created_at, format_datetime)
+)
+
+TRANSACTION_FIELDS = (
+    ('id', Transaction.id, None),
+    ('customer_id', Transaction.customer_id, None),
+    ('transaction_type', Transaction.transaction_type, None),
+    ('amount', Transaction.amount, None),
+    ('balance_after', Transaction.balance_after, None),
+    ('description', Transaction.description, None),
+    ('related_customer_id', Transaction.related_customer_id, None),
+    ('created_at', Transaction.created_at, format_datetime)
+)
+
+FRAUD_ALERT_FIELDS = (
+    ('id', FraudAlert.id, None),
+    ('customer_id', FraudAlert.customer_id, None),
+    ('alert_type', FraudAlert.alert_type, None),
+    ('description', FraudAlert.description, None),
+    ('severity', FraudAlert.severity, None),
+    ('status', FraudAlert.status, None),
+    ('created_at', FraudAlert.created_at, format_datetime),
+    ('resolved_at', FraudAlert.resolved_at, format_datetime)
+)
+
+SERIALIZE_CHUNK_SIZE = 1000
+
+# orjson and repr() agree on floats in [1e-4, 1e16); outside it they use different
+# notations (1e16 vs 1e+16, 0.00001 vs 1e-05). Matches number tokens in that range.
+ORJSON_FLOAT_MISMATCH_RE = re.compile(rb'[:,\[]-?(?:\d+(?:\.\d+)?e|0\.0000)')
+
+def _json_ascii_escape(error):
+    """Codec error handler: \\uXXXX escapes, as json.dumps(ensure_ascii=True) writes them"""
+    escaped = []
+    for char in error.object[error.start:error.end]:
+        code = ord(char)
+        if code > 0xFFFF:
+            code -= 0x10000
+            escaped.append('\\u%04x\\u%04x' % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF)))
+        else:
+            escaped.append('\\u%04x' % code)
+    return ''.join(escaped), error.end
+
+codecs.register_error('json_ascii_escape', _json_ascii_escape)
+
+def dumps_json(obj):
+    """Encode to the same bytes as jsonify (without its trailing newline)
+
+    orjson is used when installed and its output is rewritten to jsonify's
+    ASCII escaping; floats it would format differently fall back to json.
+    NaN and infinity are the exception: orjson writes null.
+    """
+    if orjson is not None:
+        body = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        if not ORJSON_FLOAT_MISMATCH_RE.search(body):
+            if not body.isascii():
+                body = body.decode('utf-8').encode('ascii', 'json_ascii_escape')
+            # json escapes DEL too; a raw 0x7f byte can only occur inside a string
+            return body.replace(b'\x7f', b'\\u007f')
+    return json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def select_rows(fields, *criteria, order_by=None):
+    """Build a column-only SELECT for a field spec"""
+    stmt = db.select(*[column for _, column, _ in fields])
+    if criteria:
+        stmt = stmt.where(*criteria)
+    if order_by is not None:
+        stmt = stmt.order_by(order_by)
+    return stmt
+
+def iter_row_dicts(stmt, fields, chunk_size=SERIALIZE_CHUNK_SIZE):
+    """Execute stmt and yield lists of dicts, one list per chunk of rows"""
+    keys = [key for key, _, _ in fields]
+    formatters = [(i, fmt) for i, (_, _, fmt) in enumerate(fields) if fmt]
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+
+    for chunk in result.partitions():
+        columns = list(zip(*chunk))
+        for i, fmt in formatters:
+            columns[i] = [fmt(v) if v is not None else None for v in columns[i]]
+        yield [dict(zip(keys, values)) for values in zip(*columns)]
+
+def json_list_response(chunks, stream=False):
+    """Return a JSON array response from chunks of dicts, optionally streamed"""
+    if not stream:
+        items = [item for chunk in chunks for item in chunk]
+        return Response(dumps_json(items) + b'\n', mimetype='application/json')
+
+    def generate():
+        yield b'['
+        first = True
+        for chunk in chunks:
+            if not chunk:
+                continue
+            body = b','.join(dumps_json(item) for item in chunk)
+            yield body if first else b',' + body
+            first = False
+        yield b']\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+def wants_stream():
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
 # Utility Functions
 def generate_otp():
     return str(secrets.randbelow(900000) + 100000)
 
-def send_otp_email(email, otp):
-    # Simulate OTP sending (in production, use actual email service)
-    print(f"OTP for {email}: {otp}")
+def send_otp_email(user_id):
+    # Delivered by the job worker (see deliver_otp_emails), which reads the
+    # code from the user row so it is never copied into a job payload
+    enqueue_job('send_otp_email', {'user_id': user_id})
     return True
 
+# Live fraud rules; `flask fraud backtest` replays history against variations
+FRAUD_LARGE_WITHDRAWAL_RATIO = 0.5   # share of the balance
+FRAUD_RECENT_WINDOW = timedelta(hours=1)
+FRAUD_MAX_RECENT_TRANSACTIONS = 5
+
 def check_fraud_conditions(customer_id, amount, transaction_type):
-    """Check for potential fraud conditions"""
+    """Check for potential fraud conditions
+    
+    The alert row is written by the job worker; the job is committed together
+    with the caller's transaction.
+    """
     customer = Customer.query.get(customer_id)
     
     # Large withdrawal alert (more than 50% of balance)
-    if transaction_type == 'withdraw' and amount > customer.balance * 0.5:
-        alert = FraudAlert(
-            customer_id=customer_id,
-            alert_type='large_withdrawal',
-            description=f'Large withdrawal of ₹{amount} ({(amount/customer.balance)*100:.1f}% of balance)',
-            severity='high'
-        )
-        db.session.add(alert)
-        db.session.commit()
+    if transaction_type == 'withdraw' and amount > customer.balance * FRAUD_LARGE_WITHDRAWAL_RATIO:
+        enqueue_job('fraud_alert', {
+            'customer_id': customer_id,
+            'alert_type': 'large_withdrawal',
+            'description': f'Large withdrawal of ₹{amount} ({(amount/customer.balance)*100:.1f}% of balance)',
+            'severity': 'high',
+            'created_at': datetime.utcnow().isoformat()
+        })
         return True
     
     # Unusual transaction pattern (multiple transactions in short time)
     recent_transactions = Transaction.query.filter(
         Transaction.customer_id == customer_id,
-        Transaction.created_at >= datetime.utcnow() - timedelta(hours=1)
+        Transaction.created_at >= datetime.utcnow() - FRAUD_RECENT_WINDOW
     ).count()
     
-    if recent_transactions > 5:
-        alert = FraudAlert(
-            customer_id=customer_id,
-            alert_type='unusual_transaction',
-            description=f'Multiple transactions ({recent_transactions}) in last hour',
-            severity='medium'
-        )
-        db.session.add(alert)
-        db.session.commit()
+    if recent_transactions > FRAUD_MAX_RECENT_TRANSACTIONS:
+        enqueue_job('fraud_alert', {
+            'customer_id': customer_id,
+            'alert_type': 'unusual_transaction',
+            'description': f'Multiple transactions ({recent_transactions}) in last hour',
+            'severity': 'medium',
+            'created_at': datetime.utcnow().isoformat()
+        })
         return True
     
     return False
 
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 def calculate_emi(principal, annual_rate, tenure_months):
     """Calculate EMI using standard formula"""
     monthly_rate = annual_rate / (12 * 100)
@@ -275,6 +539,1578 @@ def calculate_fd_maturity(principal, annual_rate, tenure_months):
     """Calculate FD maturity amount"""
     return round(principal * (1 + (annual_rate / 100)) ** (tenure_months / 12), 2)
 
+# Background Jobs
+# Slow side effects are queued as rows in the job table, in the same
+# transaction as the request's own writes, and run in batches by
+# `flask --app app jobs work`. Failed jobs are retried with exponential backoff.
+JOB_HANDLERS = {}
+JOB_LOCK_TIMEOUT = timedelta(minutes=5)
+JOB_RETRY_BASE_SECONDS = 5
+
+def job_handler(kind):
+    """Register a handler that receives a list of payloads of one kind"""
+    def decorator(f):
+        JOB_HANDLERS[kind] = f
+        return f
+    return decorator
+
+def enqueue_job(kind, payload, delay_seconds=0, max_attempts=5):
+    """Add a job to the current session; it is committed with the caller's transaction"""
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        status='pending',
+        max_attempts=max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay_seconds)
+    )
+    db.session.add(job)
+    return job
+
+@job_handler('send_otp_email')
+def deliver_otp_emails(payloads):
+    user_ids = {payload['user_id'] for payload in payloads}
+    for user in User.query.filter(User.id.in_(user_ids), User.otp_secret.isnot(None)):
+        # Simulate OTP sending (in production, use actual email service)
+        print(f"OTP for {user.email}: {user.otp_secret}")
+
+@job_handler('fraud_alert')
+def insert_fraud_alerts(payloads):
+    rows = [dict(payload, created_at=datetime.fromisoformat(payload['created_at'])) for payload in payloads]
+    # ORM inserts (batched with RETURNING) so the outbox hook records them
+    db.session.add_all([FraudAlert(**row) for row in rows])
+    db.session.flush()
+    apply_rollup_deltas(rollup_deltas([], rows))
+
+@job_handler('record_login')
+def record_logins(payloads):
+    # Only the latest login per user matters
+    latest = {}
+    for payload in payloads:
+        if payload['at'] > latest.get(payload['user_id'], ''):
+            latest[payload['user_id']] = payload['at']
+    db.session.execute(db.update(User), [
+        {'id': user_id, 'last_login': datetime.fromisoformat(at), 'otp_verified': True}
+        for user_id, at in latest.items()
+    ])
+
+# Transaction Rollups
+# Hourly and daily counts, amounts and alert counts per transaction type, both
+# bank-wide (customer_id 0) and per customer. A rollup job is queued with every
+# new Transaction in the same commit; the worker folds a batch of them into
+# one upsert per bucket, so no request writes to a shared rollup row.
+ROLLUP_GRANULARITIES = ('hour', 'day')
+
+def rollup_bucket(value, granularity):
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def rollup_deltas(transactions, alerts):
+    """Aggregate transaction and alert dicts into {bucket key: [count, amount, alerts]}"""
+    deltas = {}
+    for t in transactions:
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket = rollup_bucket(t['created_at'], granularity)
+            for customer_id in (0, t['customer_id']):
+                for transaction_type in ('*', t['transaction_type']):
+                    delta = deltas.setdefault((granularity, bucket, customer_id, transaction_type), [0, 0.0, 0])
+                    delta[0] += 1
+                    delta[1] += t['amount']
+    for a in alerts:
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket = rollup_bucket(a['created_at'], granularity)
+            for customer_id in (0, a['customer_id']):
+                deltas.setdefault((granularity, bucket, customer_id, '*'), [0, 0.0, 0])[2] += 1
+    return deltas
+
+def apply_rollup_deltas(deltas):
+    """Add deltas to the rollup rows with INSERT ... ON CONFLICT DO UPDATE"""
+    if not deltas:
+        return
+    dialect = db.engine.dialect.name
+    insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}[dialect]
+    rows = [
+        {'granularity': g, 'bucket_start': b, 'customer_id': c, 'transaction_type': t,
+         'transaction_count': count, 'total_amount': amount, 'alert_count': alerts}
+        # Sorted so concurrent workers lock rollup rows in the same order
+        for (g, b, c, t), (count, amount, alerts) in sorted(deltas.items())
+    ]
+    table = TransactionRollup.__table__
+    for chunk in chunked(rows, 1000):
+        stmt = insert(table).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['granularity', 'customer_id', 'transaction_type', 'bucket_start'],
+            set_={
+                'transaction_count': table.c.transaction_count + stmt.excluded.transaction_count,
+                'total_amount': table.c.total_amount + stmt.excluded.total_amount,
+                'alert_count': table.c.alert_count + stmt.excluded.alert_count
+            }
+        )
+        db.session.execute(stmt)
+
+@job_handler('rollup_transactions')
+def rollup_transactions(payloads):
+    transactions = [dict(p, created_at=datetime.fromisoformat(p['created_at'])) for p in payloads]
+    apply_rollup_deltas(rollup_deltas(transactions, []))
+
+@event.listens_for(Session, 'before_flush')
+def queue_transaction_rollups(session, flush_context, instances):
+    for obj in list(session.new):
+        if isinstance(obj, Transaction):
+            if obj.created_at is None:
+                obj.created_at = datetime.utcnow()
+            session.add(Job(
+                kind='rollup_transactions',
+                payload=json.dumps({
+                    'customer_id': obj.customer_id,
+                    'transaction_type': obj.transaction_type,
+                    'amount': obj.amount,
+                    'created_at': obj.created_at.isoformat()
+                }),
+                status='pending',
+                max_attempts=5,
+                run_at=datetime.utcnow()
+            ))
+
+def rebuild_rollups(chunk_size=10000):
+    """Recompute all rollups from the transaction and fraud alert tables and the archive files"""
+    periods = load_archive_manifest()['periods']
+    missing = [p['file'] for p in periods if not os.path.exists(os.path.join(archive_dir(), p['file']))]
+    if missing:
+        # Rebuilding without them would erase those months' rollups
+        raise click.ClickException(f"Archive files missing from {archive_dir()}: {', '.join(missing)}")
+
+    db.session.execute(db.delete(TransactionRollup))
+    # Their transactions are counted below
+    db.session.execute(db.delete(Job).where(Job.kind == 'rollup_transactions', Job.status.in_(['pending', 'running'])))
+
+    # Rows left behind by an interrupted archive run are already in its file
+    archived = [db.and_(Transaction.created_at >= datetime.strptime(p['from'], '%Y-%m-%d %H:%M:%S'),
+                        Transaction.created_at < datetime.strptime(p['to'], '%Y-%m-%d %H:%M:%S')) for p in periods]
+    sources = (
+        (db.select(Transaction.customer_id, Transaction.transaction_type, Transaction.amount, Transaction.created_at)
+         .where(Transaction.created_at.isnot(None), *[db.not_(period) for period in archived]), True),
+        (db.select(FraudAlert.customer_id, FraudAlert.created_at).where(FraudAlert.created_at.isnot(None)), False)
+    )
+    counted = 0
+    for stmt, is_transaction in sources:
+        result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+        for chunk in result.mappings().partitions():
+            rows = [dict(row) for row in chunk]
+            apply_rollup_deltas(rollup_deltas(rows, []) if is_transaction else rollup_deltas([], rows))
+            counted += len(rows) if is_transaction else 0
+
+    for period in periods:
+        with gzip.open(os.path.join(archive_dir(), period['file']), 'rb') as f:
+            for lines in iter(lambda: list(islice(f, chunk_size)), []):
+                rows = [json.loads(line) for line in lines]
+                for row in rows:
+                    row['created_at'] = datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S')
+                apply_rollup_deltas(rollup_deltas(rows, []))
+                counted += len(rows)
+    db.session.commit()
+    return counted
+
+# Outbox
+# Every create, update and delete of a Transaction, Deposit, Loan or FraudAlert
+# writes an outbox_event row on the same connection during the flush, so the
+# event commits or rolls back with the change. Consumers read the table in id
+# order through /api/outbox/events or `flask outbox tail`.
+OUTBOX_AGGREGATES = {
+    Transaction: 'transaction',
+    Deposit: 'deposit',
+    Loan: 'loan',
+    FraudAlert: 'fraud_alert'
+}
+OUTBOX_MAX_BATCH = 10000
+# PostgreSQL allocates ids at insert, so a slow transaction could commit an id
+# below one a consumer has already passed. Each transaction's events are given
+# new ids as it commits, under an advisory lock held until the commit is
+# visible, so ids become visible in order. (SQLite has one writer at a time.)
+OUTBOX_COMMIT_LOCK = 0x6f7574626f78  # 'outbox'
+
+def outbox_rows(objects, event_type, now):
+    return [{
+        'aggregate': OUTBOX_AGGREGATES[type(obj)],
+        'aggregate_id': obj.id,
+        'event_type': event_type,
+        'payload': dumps_json(obj.to_dict()).decode('utf-8'),
+        'created_at': now
+    } for obj in objects if type(obj) in OUTBOX_AGGREGATES]
+
+def write_outbox_events(connection, rows):
+    if not rows:
+        return
+    if connection.dialect.name != 'postgresql':
+        connection.execute(OutboxEvent.__table__.insert(), rows)
+        return
+    ids = connection.execute(OutboxEvent.__table__.insert().returning(OutboxEvent.id), rows).scalars().all()
+    connection.info.setdefault('outbox_event_ids', []).extend(ids)
+
+@event.listens_for(Engine, 'begin')
+def reset_outbox_event_ids(conn):
+    conn.info.pop('outbox_event_ids', None)
+
+@event.listens_for(Engine, 'commit')
+def renumber_outbox_events(conn):
+    ids = conn.info.pop('outbox_event_ids', None)
+    if not ids:
+        return
+    # The last lock this transaction takes, so it can't be part of a deadlock
+    conn.execute(db.text('SELECT pg_advisory_xact_lock(:key)'), {'key': OUTBOX_COMMIT_LOCK})
+    # Rows from rolled-back savepoints are simply not found
+    conn.execute(db.text(
+        "UPDATE outbox_event SET id = renumbered.new_id "
+        "FROM (SELECT id AS old_id, nextval(pg_get_serial_sequence('outbox_event', 'id')) AS new_id "
+        "      FROM (SELECT id FROM outbox_event WHERE id = ANY(:ids) ORDER BY id) ordered) renumbered "
+        "WHERE outbox_event.id = renumbered.old_id"), {'ids': ids})
+
+@event.listens_for(Session, 'after_flush')
+def record_outbox_events(session, flush_context):
+    now = datetime.utcnow()
+    updated = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    rows = (outbox_rows(session.new, 'created', now)
+            + outbox_rows(updated, 'updated', now)
+            + outbox_rows(session.deleted, 'deleted', now))
+    write_outbox_events(session.connection(), rows)
+
+def read_outbox_events(after, limit):
+    """Events with id > after, oldest first, as (id, NDJSON line) pairs"""
+    query = db.select(OutboxEvent.id, OutboxEvent.aggregate, OutboxEvent.aggregate_id, OutboxEvent.event_type,
+                      OutboxEvent.created_at, OutboxEvent.payload).where(OutboxEvent.id > after)
+    rows = db.session.execute(query.order_by(OutboxEvent.id).limit(limit)).all()
+    events = []
+    for event_id, aggregate, aggregate_id, event_type, created_at, payload in rows:
+        envelope = dumps_json({
+            'id': event_id,
+            'aggregate': aggregate,
+            'aggregate_id': aggregate_id,
+            'event_type': event_type,
+            'created_at': format_datetime(created_at)
+        })
+        # Splice the stored JSON in rather than decoding and re-encoding it
+        events.append((event_id, envelope[:-1] + b',"data":' + payload.encode('utf-8') + b'}\n'))
+    return events
+
+@app.cli.group('outbox')
+def outbox_cli():
+    """Change feed of money movements"""
+
+@outbox_cli.command('tail')
+@click.option('--after', default=None, type=int, help='Start after this event id')
+@click.option('--cursor-file', type=click.Path(), help='Read the start cursor from and save progress to this file')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--follow', is_flag=True, help='Keep polling for new events')
+@click.option('--poll-interval', default=1.0, show_default=True)
+def outbox_tail_command(after, cursor_file, batch_size, follow, poll_interval):
+    """Write events to stdout as NDJSON"""
+    if after is None:
+        after = 0
+        if cursor_file and os.path.exists(cursor_file):
+            with open(cursor_file) as f:
+                after = int(f.read().strip() or 0)
+    out = click.get_binary_stream('stdout')
+    batch_size = min(batch_size, OUTBOX_MAX_BATCH)
+    while True:
+        # A plain read transaction; in SQLite concurrency mode CLI transactions take the write lock otherwise
+        db.session.connection(execution_options={'sqlite_reads_only': True})
+        events = read_outbox_events(after, batch_size)
+        db.session.rollback()  # end the read transaction so the next poll sees new commits
+        if events:
+            out.write(b''.join(line for _, line in events))
+            out.flush()
+            after = events[-1][0]
+            if cursor_file:
+                with open(cursor_file + '.tmp', 'w') as f:
+                    f.write(str(after))
+                os.replace(cursor_file + '.tmp', cursor_file)
+        if len(events) == batch_size:
+            continue
+        if not follow:
+            return
+        time.sleep(poll_interval)
+
+@outbox_cli.command('prune')
+@click.option('--keep-days', default=7, show_default=True)
+@click.option('--before-id', type=int, help="Only delete ids below this (the slowest consumer's cursor + 1)")
+def outbox_prune_command(keep_days, before_id):
+    """Delete events older than --keep-days, read or not (consumer cursors are not tracked)"""
+    query = db.delete(OutboxEvent).where(OutboxEvent.created_at < datetime.utcnow() - timedelta(days=keep_days))
+    if before_id is not None:
+        query = query.where(OutboxEvent.id < before_id)
+    result = db.session.execute(query)
+    db.session.commit()
+    click.echo(f"Deleted {result.rowcount} events")
+
+def claim_jobs(worker_id, batch_size):
+    """Atomically mark up to batch_size due jobs as ours and return them"""
+    now = datetime.utcnow()
+    due = db.select(Job.id).where(
+        db.or_(
+            db.and_(Job.status == 'pending', Job.run_at <= now),
+            db.and_(Job.status == 'running', Job.locked_at < now - JOB_LOCK_TIMEOUT)
+        )
+    ).order_by(Job.run_at).limit(batch_size)
+    if db.engine.dialect.name == 'postgresql':
+        # Concurrent workers take the next due rows instead of queueing
+        # behind each other's locks on the same ones. Materialized so the
+        # select runs once; as a plain subquery PostgreSQL may re-run it
+        # and skip to further rows, claiming more than batch_size.
+        due = due.with_for_update(skip_locked=True).cte('due').prefix_with('MATERIALIZED')
+    else:
+        due = due.cte('due')
+    # Re-checking status in the UPDATE means two workers can't both claim a row
+    db.session.execute(
+        db.update(Job)
+        .where(Job.id.in_(db.select(due.c.id)), Job.status.in_(['pending', 'running']),
+               db.or_(Job.locked_at.is_(None), Job.locked_at < now - JOB_LOCK_TIMEOUT))
+        .values(status='running', locked_by=worker_id, locked_at=now, attempts=Job.attempts + 1),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return Job.query.filter_by(status='running', locked_by=worker_id).order_by(Job.id).all()
+
+def finish_jobs(jobs):
+    # There is one job per login and per transaction; keeping them would grow the table forever
+    for job in jobs:
+        db.session.delete(job)
+
+def retry_job(job, error):
+    job.locked_by = None
+    job.locked_at = None
+    job.last_error = str(error)[:1000]
+    if job.attempts >= job.max_attempts:
+        job.status = 'failed'
+    else:
+        job.status = 'pending'
+        job.run_at = datetime.utcnow() + timedelta(seconds=JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+
+def run_job_batch(jobs):
+    """Run claimed jobs one batch per kind; if a batch fails, retry its jobs one by one"""
+    by_kind = {}
+    for job in jobs:
+        by_kind.setdefault(job.kind, []).append(job)
+
+    for kind, group in by_kind.items():
+        handler = JOB_HANDLERS.get(kind)
+        if handler is None:
+            for job in group:
+                job.attempts = job.max_attempts
+                retry_job(job, f'No handler for job kind {kind}')
+            db.session.commit()
+            continue
+
+        try:
+            handler([json.loads(job.payload) for job in group])
+            finish_jobs(group)
+            db.session.commit()
+            continue
+        except Exception:
+            db.session.rollback()
+
+        for job in group:
+            try:
+                handler([json.loads(job.payload)])
+                finish_jobs([job])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                retry_job(job, e)
+                db.session.commit()
+
+def work_jobs(batch_size=100, poll_interval=1.0, once=False):
+    """Drain the queue; returns the number of jobs processed when once is set"""
+    worker_id = f"{os.getpid()}-{secrets.token_hex(4)}"
+    processed = 0
+    while True:
+        jobs = claim_jobs(worker_id, batch_size)
+        if jobs:
+            run_job_batch(jobs)
+            processed += len(jobs)
+            continue
+        if once:
+            return processed
+        time.sleep(poll_interval)
+
+def _job_worker_process(batch_size, poll_interval, once):
+    with app.app_context():
+        # Don't reuse connections inherited from the parent process
+        db.engine.dispose(close=False)
+        work_jobs(batch_size, poll_interval, once)
+
+@app.cli.group('jobs')
+def jobs_cli():
+    """Background job queue"""
+
+@jobs_cli.command('work')
+@click.option('--batch-size', default=100, show_default=True, help='Jobs claimed per round trip')
+@click.option('--processes', default=1, show_default=True, help='Worker processes to run')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds to sleep when the queue is empty')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty')
+def work_command(batch_size, processes, poll_interval, once):
+    """Run queued jobs"""
+    if processes <= 1:
+        processed = work_jobs(batch_size, poll_interval, once)
+        click.echo(f"Processed {processed} jobs")
+        return
+
+    workers = [multiprocessing.Process(target=_job_worker_process, args=(batch_size, poll_interval, once))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+@jobs_cli.command('status')
+def job_status_command():
+    """Show job counts by kind and status"""
+    rows = db.session.query(Job.kind, Job.status, db.func.count(Job.id)).group_by(Job.kind, Job.status).all()
+    for kind, status, count in rows:
+        click.echo(f"{kind:<20}{status:<10}{count}")
+
+@jobs_cli.command('prune')
+@click.option('--keep-days', default=30, show_default=True)
+def job_prune_command(keep_days):
+    """Delete failed jobs older than --keep-days"""
+    # 'done' rows only exist in databases from before finished jobs were deleted
+    result = db.session.execute(db.delete(Job).where(
+        db.or_(Job.status == 'done',
+               db.and_(Job.status == 'failed', Job.created_at < datetime.utcnow() - timedelta(days=keep_days)))))
+    db.session.commit()
+    click.echo(f"Deleted {result.rowcount} jobs")
+
+@app.cli.group('rollups')
+def rollups_cli():
+    """Transaction rollups for analytics"""
+
+@rollups_cli.command('backfill')
+def rollups_backfill_command():
+    """Rebuild all rollups from history, archive included; run with the job worker stopped"""
+    counted = rebuild_rollups()
+    click.echo(f"Rolled up {counted} transactions")
+
+# Customer Search
+# SQLite: an FTS5 trigram index (customer_fts) kept in sync by triggers on the
+# customer table. PostgreSQL: GIN tsvector and pg_trgm indexes on one search
+# expression, which the database maintains itself.
+SEARCH_MAX_PER_PAGE = 100
+
+PG_SEARCH_TEXT = "lower(first_name || ' ' || last_name || ' ' || email || ' ' || phone || ' ' || account_number)"
+# Each term is compared with the closest part of the search text
+# (word_similarity, the indexed <% operator). A one-letter typo in a short
+# name scores about 0.3-0.5, below pg_trgm's default threshold of 0.6.
+PG_WORD_SIMILARITY_THRESHOLD = 0.3
+
+SQLITE_SEARCH_COLUMNS = ('first_name', 'last_name', 'email', 'phone', 'account_number')
+
+def search_terms(q):
+    return [term for term in re.split(r'\s+', q.strip().lower()) if term]
+
+def fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+def trigrams(terms):
+    return sorted({term[i:i + 3] for term in terms for i in range(len(term) - 2)})
+
+def search_customer_ids_sqlite(terms, limit, offset):
+    long_terms = [t for t in terms if len(t) >= 3]
+    short_terms = [t for t in terms if len(t) < 3]
+
+    params = {'limit': limit, 'offset': offset}
+    prefix_filters = []
+    for i, term in enumerate(short_terms):
+        # Trigram index needs 3+ characters; short terms only filter by prefix
+        params[f'p{i}'] = term.replace('%', '').replace('_', '') + '%'
+        prefix_filters.append('(' + ' OR '.join(f'customer.{c} LIKE :p{i}' for c in SQLITE_SEARCH_COLUMNS) + ')')
+    prefix_sql = ''.join(f' AND {f}' for f in prefix_filters)
+
+    if not long_terms:
+        sql = f"SELECT customer.id FROM customer WHERE 1 = 1{prefix_sql} ORDER BY customer.id LIMIT :limit OFFSET :offset"
+        return [row[0] for row in db.session.execute(db.text(sql), params)]
+
+    sql = (
+        "SELECT customer.id FROM customer_fts JOIN customer ON customer.id = customer_fts.rowid "
+        f"WHERE customer_fts MATCH :match{prefix_sql} "
+        "ORDER BY bm25(customer_fts), customer.id LIMIT :limit OFFSET :offset"
+    )
+    # Every term as a substring first; if nothing matches at all, rank by
+    # shared trigrams instead (fuzzy)
+    exact = ' AND '.join(fts_phrase(t) for t in long_terms)
+    ids = [row[0] for row in db.session.execute(db.text(sql), dict(params, match=exact))]
+    if ids:
+        return ids
+    if offset and db.session.execute(db.text(sql), dict(params, match=exact, limit=1, offset=0)).first():
+        return []
+    fuzzy = ' OR '.join(fts_phrase(t) for t in trigrams(long_terms))
+    return [row[0] for row in db.session.execute(db.text(sql), dict(params, match=fuzzy))]
+
+def search_customer_ids_postgresql(terms, limit, offset):
+    words = re.findall(r'\w+', ' '.join(terms))
+    tsquery = ' & '.join(f'{word}:*' for word in words)
+    tsvector = f"to_tsvector('simple', {PG_SEARCH_TEXT})"
+    params = {f't{i}': term for i, term in enumerate(terms)}
+    fuzzy = ' AND '.join(f":{name} <% {PG_SEARCH_TEXT}" for name in params)
+    similarity = ' + '.join(f"word_similarity(:{name}, {PG_SEARCH_TEXT})" for name in params)
+    sql = (
+        f"SELECT id FROM customer "
+        f"WHERE ({tsvector} @@ to_tsquery('simple', :tsquery) AND :tsquery <> '') OR ({fuzzy}) "
+        f"ORDER BY (CASE WHEN :tsquery <> '' THEN ts_rank({tsvector}, to_tsquery('simple', :tsquery)) ELSE 0 END) "
+        f"+ ({similarity}) / {len(params)} DESC, id "
+        f"LIMIT :limit OFFSET :offset"
+    )
+    # Local to the request's transaction
+    db.session.execute(db.text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                       {'threshold': str(PG_WORD_SIMILARITY_THRESHOLD)})
+    params.update(tsquery=tsquery, limit=limit, offset=offset)
+    return [row[0] for row in db.session.execute(db.text(sql), params)]
+
+def search_customer_ids_generic(terms, limit, offset):
+    stmt = db.select(Customer.id)
+    for term in terms:
+        pattern = term.replace('%', '').replace('_', '') + '%'
+        stmt = stmt.where(db.or_(*[getattr(Customer, c).ilike(pattern) for c in SQLITE_SEARCH_COLUMNS]))
+    return list(db.session.scalars(stmt.order_by(Customer.id).limit(limit).offset(offset)))
+
+def search_customers(q, page=1, per_page=20):
+    """Return (ranked customer dicts, has_more) for a search query"""
+    terms = search_terms(q)
+    if not terms:
+        return [], False
+
+    dialect = db.engine.dialect.name
+    search = {
+        'sqlite': search_customer_ids_sqlite,
+        'postgresql': search_customer_ids_postgresql
+    }.get(dialect, search_customer_ids_generic)
+    # Fetch one extra id to know whether there is a next page
+    ids = search(terms, per_page + 1, (page - 1) * per_page)
+    has_more = len(ids) > per_page
+    ids = ids[:per_page]
+    if not ids:
+        return [], False
+
+    rows = {}
+    for chunk in iter_row_dicts(select_rows(CUSTOMER_FIELDS, Customer.id.in_(ids)), CUSTOMER_FIELDS):
+        rows.update((row['id'], row) for row in chunk)
+    return [rows[i] for i in ids if i in rows], has_more
+
+# Customer Import
+# Onboards users with pending customer accounts from CSV or NDJSON, a chunk at
+# a time: uniqueness is checked with one query per column, passwords are
+# hashed in a process pool while the previous chunk is being inserted, and
+# each chunk gets a block of account numbers and two bulk INSERTs.
+IMPORT_REQUIRED_FIELDS = ('username', 'email', 'phone')
+IMPORT_OPTIONAL_FIELDS = ('first_name', 'last_name', 'pan_number', 'aadhar_number', 'address', 'date_of_birth')
+IMPORT_MAX_LENGTHS = {
+    'username': User.username.type.length,
+    'email': Customer.email.type.length,
+    'phone': User.phone.type.length,
+    'first_name': Customer.first_name.type.length,
+    'last_name': Customer.last_name.type.length,
+    'pan_number': Customer.pan_number.type.length,
+    'aadhar_number': Customer.aadhar_number.type.length
+}
+IMPORT_HASH_BATCH = 32  # passwords per pool task
+# Hashes carried over from the system being migrated are stored as they are
+BCRYPT_HASH_RE = re.compile(r'^\$2[aby]\$\d\d\$[./A-Za-z0-9]{53}$')
+
+def read_import_rows(stream, fmt):
+    """Yield (line number, row dict or None) from a CSV or NDJSON stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+def validate_import_row(row):
+    """Return (record, errors) for one input row"""
+    if row is None:
+        return None, ['Not a JSON object']
+    row = {key: str(value).strip() for key, value in row.items() if key and value is not None}
+    errors = [f"{field} is required" for field in IMPORT_REQUIRED_FIELDS if not row.get(field)]
+    errors.extend(f"{field} is longer than {limit} characters"
+                  for field, limit in IMPORT_MAX_LENGTHS.items() if len(row.get(field, '')) > limit)
+    if row.get('email') and '@' not in row['email']:
+        errors.append('email is invalid')
+    if row.get('password_hash'):
+        if not BCRYPT_HASH_RE.match(row['password_hash']):
+            errors.append('password_hash is not a bcrypt hash')
+    elif not row.get('password'):
+        errors.append('password or password_hash is required')
+    date_of_birth = None
+    if row.get('date_of_birth'):
+        try:
+            date_of_birth = datetime.strptime(row['date_of_birth'], '%Y-%m-%d').date()
+        except ValueError:
+            errors.append('date_of_birth must be YYYY-MM-DD')
+    if errors:
+        return None, errors
+
+    record = {field: row.get(field) or None for field in IMPORT_REQUIRED_FIELDS + IMPORT_OPTIONAL_FIELDS}
+    record.update(
+        first_name=row.get('first_name') or row['username'],
+        last_name=row.get('last_name', ''),
+        date_of_birth=date_of_birth,
+        password=row.get('password'),
+        password_hash=row.get('password_hash')
+    )
+    return record, []
+
+def import_conflicts(records):
+    """Map record index to an error for usernames and emails already in the database"""
+    usernames = [r['username'] for r in records]
+    emails = [r['email'] for r in records]
+    taken_usernames = set(db.session.scalars(db.select(User.username).where(User.username.in_(usernames))))
+    taken_emails = set(db.session.scalars(db.select(User.email).where(User.email.in_(emails))))
+    taken_emails.update(db.session.scalars(db.select(Customer.email).where(Customer.email.in_(emails))))
+    conflicts = {}
+    for i, record in enumerate(records):
+        if record['username'] in taken_usernames:
+            conflicts[i] = 'Username already taken'
+        elif record['email'] in taken_emails:
+            conflicts[i] = 'Email already registered'
+    return conflicts
+
+def prepare_import_chunk(rows, seen):
+    """Validate a chunk; return (records, line numbers, error results)"""
+    records, lines, results = [], [], []
+    for line, row in rows:
+        record, errors = validate_import_row(row)
+        if record is not None:
+            if record['username'] in seen['username']:
+                errors = ['Username appears earlier in the file']
+            elif record['email'] in seen['email']:
+                errors = ['Email appears earlier in the file']
+        if errors:
+            results.append({'line': line, 'status': 'error', 'username': (row or {}).get('username'),
+                            'email': (row or {}).get('email'), 'errors': errors})
+            continue
+        seen['username'].add(record['username'])
+        seen['email'].add(record['email'])
+        records.append(record)
+        lines.append(line)
+
+    conflicts = import_conflicts(records) if records else {}
+    for i in sorted(conflicts, reverse=True):
+        results.append({'line': lines[i], 'status': 'error', 'username': records[i]['username'],
+                        'email': records[i]['email'], 'errors': [conflicts[i]]})
+        del records[i], lines[i]
+    return records, lines, results
+
+def hash_import_passwords(passwords):
+    """Runs in the import's process pool"""
+    return [bcrypt.generate_password_hash(password).decode('utf-8') for password in passwords]
+
+def insert_import_chunk(records, lines):
+    """Insert users and customers for records (password_hash set); return created results"""
+    if db.engine.dialect.name == 'postgresql':
+        # Keep registrations from taking account numbers inside this block
+        db.session.execute(db.text('LOCK TABLE customer IN SHARE ROW EXCLUSIVE MODE'))
+    user_ids = db.session.scalars(
+        db.insert(User).returning(User.id, sort_by_parameter_order=True),
+        [{'username': r['username'], 'email': r['email'], 'password_hash': r['password_hash'],
+          'role': 'customer', 'phone': r['phone']} for r in records]
+    ).all()
+    next_id = (db.session.scalar(db.select(db.func.max(Customer.id))) or 0) + 1
+    customers = [{
+        'user_id': user_id,
+        'account_number': f"ACC{next_id + i:08d}",
+        'first_name': r['first_name'],
+        'last_name': r['last_name'],
+        'email': r['email'],
+        'phone': r['phone'],
+        'kyc_verified': False,
+        'account_status': 'pending',
+        'pan_number': r['pan_number'],
+        'aadhar_number': r['aadhar_number'],
+        'address': r['address'],
+        'date_of_birth': r['date_of_birth']
+    } for i, (r, user_id) in enumerate(zip(records, user_ids))]
+    customer_ids = db.session.scalars(
+        db.insert(Customer).returning(Customer.id, sort_by_parameter_order=True), customers).all()
+    db.session.commit()
+    return [{'line': line, 'status': 'created', 'username': r['username'], 'user_id': user_id,
+             'customer_id': customer_id, 'account_number': c['account_number']}
+            for line, r, user_id, customer_id, c in zip(lines, records, user_ids, customer_ids, customers)]
+
+def finish_import_chunk(records, lines, hashed):
+    """Attach pool hashes and insert; rows that became taken meanwhile are reported, the rest retried"""
+    hashes = iter(hash_ for batch in hashed for hash_ in batch)
+    for record in records:
+        if not record['password_hash']:
+            record['password_hash'] = next(hashes)
+    try:
+        return insert_import_chunk(records, lines)
+    except IntegrityError:
+        db.session.rollback()
+    conflicts = import_conflicts(records)
+    results = [{'line': lines[i], 'status': 'error', 'username': records[i]['username'],
+                'email': records[i]['email'], 'errors': [error]} for i, error in conflicts.items()]
+    keep = [i for i in range(len(records)) if i not in conflicts]
+    if keep:
+        results.extend(insert_import_chunk([records[i] for i in keep], [lines[i] for i in keep]))
+    return results
+
+@app.cli.group('customers')
+def customers_cli():
+    """Customer onboarding"""
+
+@customers_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Default: from the file extension')
+@click.option('--report', type=click.Path(dir_okay=False), help='Write one NDJSON result per input row here')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per uniqueness check and INSERT')
+@click.option('--processes', type=int, help='Password hashing processes (default: one per CPU)')
+@click.option('--dry-run', is_flag=True, help='Validate and check uniqueness without writing anything')
+def import_customers_command(path, fmt, report, chunk_size, processes, dry_run):
+    """Create users and pending customer accounts from CSV or NDJSON
+
+    Columns: username, email, phone, password (or a bcrypt password_hash),
+    and optionally first_name, last_name, pan_number, aadhar_number,
+    address, date_of_birth (YYYY-MM-DD).
+    """
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    counts = {'created': 0, 'valid': 0, 'error': 0}
+    seen = {'username': set(), 'email': set()}
+    start = time.time()
+
+    def write(results):
+        results.sort(key=lambda result: result['line'])
+        for result in results:
+            counts[result['status']] += 1
+            report_file.write(dumps_json(result).decode('utf-8') + '\n')
+
+    with open(path, encoding='utf-8-sig', newline='') as stream, \
+            open(report or os.devnull, 'w', encoding='utf-8') as report_file, \
+            multiprocessing.Pool(processes) as pool:
+        rows = read_import_rows(stream, fmt)
+        pending = None  # previous chunk, hashing in the pool
+        for chunk in iter(lambda: list(islice(rows, chunk_size)), []):
+            records, lines, results = prepare_import_chunk(chunk, seen)
+            db.session.rollback()  # end the read transaction before the pool's results are awaited
+            if dry_run:
+                write(results + [{'line': line, 'status': 'valid', 'username': r['username'], 'email': r['email']}
+                                 for line, r in zip(lines, records)])
+                continue
+            passwords = [r['password'] for r in records if not r['password_hash']]
+            hashed = pool.map_async(hash_import_passwords, [passwords[i:i + IMPORT_HASH_BATCH]
+                                                            for i in range(0, len(passwords), IMPORT_HASH_BATCH)])
+            if pending:
+                write(pending[3] + finish_import_chunk(pending[0], pending[1], pending[2].get()))
+            pending = (records, lines, hashed, results)
+        if pending:
+            write(pending[3] + finish_import_chunk(pending[0], pending[1], pending[2].get()))
+
+    elapsed = time.time() - start
+    total = sum(counts.values())
+    done = f"{counts['valid']} valid" if dry_run else f"{counts['created']} created"
+    click.echo(f"{total} rows: {done}, {counts['error']} with errors in {elapsed:.1f}s "
+               f"({total / elapsed if elapsed else 0:.0f} rows/s)")
+
+# Transaction Archive
+# On PostgreSQL the transaction table is range-partitioned by month on
+# created_at. Closed months are moved to gzipped NDJSON files (one per month,
+# sorted by customer) listed in manifest.json, then their partition is dropped.
+TRANSACTION_HOT_DAYS = 90
+# Furthest the default history view looks back; older rows need ?from=&to=
+TRANSACTION_HISTORY_MONTHS = 12
+TRANSACTION_PARTITIONS_AHEAD = 3
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return datetime(value.year + month // 12, month % 12 + 1, 1)
+
+def partition_name(month):
+    return f"transaction_y{month.year}m{month.month:02d}"
+
+def ensure_transaction_partitions(months_ahead=TRANSACTION_PARTITIONS_AHEAD, start=None):
+    """Create monthly partitions from start (default: this month) through months_ahead"""
+    if db.engine.dialect.name != 'postgresql':
+        return []
+    existing = set(db.session.scalars(db.text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'transaction'")))
+    month = month_start(start or datetime.utcnow())
+    last = add_months(month_start(datetime.utcnow()), months_ahead)
+    created = []
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            # Rows for a month without a partition are in transaction_default,
+            # and PostgreSQL refuses a partition that would leave them there.
+            # Move them into a standalone table and attach it; the lock keeps
+            # new rows for the month out of the default in the meantime.
+            bounds = {'start': month, 'end': add_months(month, 1)}
+            if 'transaction_default' in existing:
+                db.session.execute(db.text('LOCK TABLE transaction_default IN EXCLUSIVE MODE'))
+            db.session.execute(db.text(f'CREATE TABLE {name} (LIKE "transaction" INCLUDING DEFAULTS)'))
+            if 'transaction_default' in existing:
+                db.session.execute(db.text(
+                    'WITH moved AS (DELETE FROM transaction_default '
+                    'WHERE created_at >= :start AND created_at < :end RETURNING *) '
+                    f'INSERT INTO {name} SELECT * FROM moved'), bounds)
+            db.session.execute(db.text(
+                f'ALTER TABLE "transaction" ATTACH PARTITION {name} '
+                f"FOR VALUES FROM ('{bounds['start']:%Y-%m-%d}') TO ('{bounds['end']:%Y-%m-%d}')"))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+def archive_dir():
+    return app.config['TRANSACTION_ARCHIVE_DIR']
+
+def load_archive_manifest():
+    path = os.path.join(archive_dir(), 'manifest.json')
+    if not os.path.exists(path):
+        return {'periods': []}
+    with open(path) as f:
+        return json.load(f)
+
+def save_archive_manifest(manifest):
+    path = os.path.join(archive_dir(), 'manifest.json')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def delete_transaction_period(month):
+    """Remove one month of transactions from the database"""
+    start, end = month, add_months(month, 1)
+    name = partition_name(month)
+    if db.engine.dialect.name == 'postgresql' and db.session.execute(
+            db.text("SELECT to_regclass(:name)"), {'name': name}).scalar():
+        db.session.execute(db.text(f'ALTER TABLE "transaction" DETACH PARTITION {name}'))
+        db.session.execute(db.text(f'DROP TABLE {name}'))
+    # Rows outside a monthly partition (SQLite, or the default partition)
+    db.session.execute(db.delete(Transaction).where(Transaction.created_at >= start, Transaction.created_at < end))
+    db.session.commit()
+
+def archive_transaction_period(month):
+    """Write one month to a compressed NDJSON file, record it in the manifest and delete it"""
+    start, end = month, add_months(month, 1)
+    period = f"{month:%Y-%m}"
+    manifest = load_archive_manifest()
+    count = db.session.query(db.func.count(Transaction.id)).filter(
+        Transaction.created_at >= start, Transaction.created_at < end).scalar()
+
+    entry = next((p for p in manifest['periods'] if p['period'] == period), None)
+    if entry is not None:
+        # Archived earlier but not deleted (interrupted run): only finish the delete
+        if count and count != entry['rows']:
+            raise click.ClickException(f"{period} is archived with {entry['rows']} rows but {count} remain in the database")
+        if count:
+            delete_transaction_period(month)
+        return entry
+    if not count:
+        return None
+
+    os.makedirs(archive_dir(), exist_ok=True)
+    filename = f"transactions-{period}.ndjson.gz"
+    path = os.path.join(archive_dir(), filename)
+    stmt = select_rows(TRANSACTION_FIELDS, Transaction.created_at >= start, Transaction.created_at < end).order_by(
+        Transaction.customer_id, Transaction.created_at, Transaction.id)
+    rows = 0
+    with gzip.open(path + '.tmp', 'wb') as f:
+        for chunk in iter_row_dicts(stmt, TRANSACTION_FIELDS):
+            f.write(b''.join(dumps_json(row) + b'\n' for row in chunk))
+            rows += len(chunk)
+    digest = hashlib.sha256()
+    with open(path + '.tmp', 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    os.replace(path + '.tmp', path)
+
+    entry = {
+        'period': period,
+        'file': filename,
+        'rows': rows,
+        'from': f"{start:%Y-%m-%d %H:%M:%S}",
+        'to': f"{end:%Y-%m-%d %H:%M:%S}",
+        'sha256': digest.hexdigest(),
+        'archived_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    manifest['periods'].append(entry)
+    manifest['periods'].sort(key=lambda p: p['period'])
+    save_archive_manifest(manifest)
+    delete_transaction_period(month)
+    return entry
+
+def archive_transactions(before):
+    """Archive every whole month that ends on or before `before`"""
+    oldest = db.session.query(db.func.min(Transaction.created_at)).scalar()
+    archived = []
+    month = month_start(oldest) if oldest else before
+    while month < before:
+        entry = archive_transaction_period(month)
+        if entry:
+            archived.append(entry)
+        month = add_months(month, 1)
+    return archived
+
+def read_archived_transactions(customer_id, start=None, end=None):
+    """Yield archived transactions of one customer with start <= created_at < end"""
+    start_s = f"{start:%Y-%m-%d %H:%M:%S}" if start else None
+    end_s = f"{end:%Y-%m-%d %H:%M:%S}" if end else None
+    for entry in load_archive_manifest()['periods']:
+        if (end_s and entry['from'] >= end_s) or (start_s and entry['to'] <= start_s):
+            continue
+        with gzip.open(os.path.join(archive_dir(), entry['file']), 'rb') as f:
+            for line in f:
+                row = json.loads(line)
+                if row['customer_id'] > customer_id:
+                    break  # files are sorted by customer
+                if row['customer_id'] != customer_id:
+                    continue
+                if (start_s and row['created_at'] < start_s) or (end_s and row['created_at'] >= end_s):
+                    continue
+                yield row
+
+@app.cli.group('transactions')
+def transactions_cli():
+    """Transaction partitions and archival"""
+
+@transactions_cli.command('partition')
+@click.option('--months-ahead', default=TRANSACTION_PARTITIONS_AHEAD, show_default=True)
+def partition_command(months_ahead):
+    """Create upcoming monthly partitions (PostgreSQL); run monthly"""
+    for name in ensure_transaction_partitions(months_ahead):
+        click.echo(f"Created partition {name}")
+    db.session.commit()
+
+@transactions_cli.command('archive')
+@click.option('--keep-months', default=12, show_default=True, help='Whole months to keep in the database')
+@click.option('--before', help='Archive months before this one (YYYY-MM) instead of using --keep-months')
+def archive_command(keep_months, before):
+    """Move closed months to compressed files in TRANSACTION_ARCHIVE_DIR"""
+    if before:
+        cutoff = datetime.strptime(before, '%Y-%m')
+    else:
+        cutoff = add_months(month_start(datetime.utcnow()), -keep_months)
+    cutoff = min(cutoff, month_start(datetime.utcnow()))  # never the open month
+    for entry in archive_transactions(cutoff):
+        click.echo(f"Archived {entry['period']}: {entry['rows']} rows -> {entry['file']}")
+
+# Fraud Backtesting
+# Replays Transaction history through variations of check_fraud_conditions.
+# Customers are split into id ranges, processed in parallel; each range is
+# streamed into numpy columns sorted by customer and time, so every rule set
+# is a few array operations: the large-withdrawal test is elementwise and the
+# trailing-window count is a searchsorted over (customer, time) keys.
+# Only cash withdrawals are checked, as in the live path, and the window rule
+# is only tried when the large-withdrawal rule did not fire.
+BACKTEST_TIME_BITS = 42  # milliseconds since the range's first transaction (~139 years)
+
+def epoch_seconds(column):
+    if db.engine.dialect.name == 'postgresql':
+        return db.func.extract('epoch', column)
+    return (db.func.julianday(column) - 2440587.5) * 86400.0
+
+def backtest_keys(customer_index, millis):
+    return (customer_index.astype(numpy.int64) << BACKTEST_TIME_BITS) | millis
+
+def as_columns(rows, width):
+    # Flattening first is much faster than letting numpy inspect each Row
+    return numpy.fromiter(chain.from_iterable(rows), dtype=numpy.float64,
+                          count=len(rows) * width).reshape(-1, width)
+
+def near(a, b, tolerance):
+    """For each key in sorted a, whether sorted b has a key within tolerance"""
+    if not len(a) or not len(b):
+        return numpy.zeros(len(a), dtype=bool)
+    i = numpy.searchsorted(b, a)
+    before = b[numpy.clip(i - 1, 0, len(b) - 1)]
+    after = b[numpy.clip(i, 0, len(b) - 1)]
+    return (numpy.abs(a - before) <= tolerance) | (numpy.abs(after - a) <= tolerance)
+
+def backtest_customer_range(args):
+    """Alert counts for each rule set over customers first_id <= id < last_id"""
+    first_id, last_id, rule_sets, match_seconds, chunk_size = args
+    stmt = db.select(
+        Transaction.customer_id,
+        # Fixed deposits are booked as withdrawals but never go through the fraud check;
+        # they still count towards the window
+        db.case((db.and_(Transaction.transaction_type == 'withdraw',
+                         db.func.coalesce(Transaction.description, '').notlike('Fixed Deposit%')), 1), else_=0),
+        Transaction.amount,
+        Transaction.balance_after,
+        epoch_seconds(Transaction.created_at)
+    ).where(Transaction.customer_id >= first_id, Transaction.customer_id < last_id) \
+     .order_by(Transaction.customer_id, Transaction.created_at, Transaction.id)
+    # One read transaction, so transactions and alerts come from the same snapshot
+    with db.engine.connect().execution_options(sqlite_reads_only=True) as connection:
+        chunks = [as_columns(rows, 5)
+                  for rows in connection.execution_options(yield_per=chunk_size).execute(stmt).partitions()]
+        alerts = as_columns(connection.execute(db.select(
+            FraudAlert.customer_id,
+            db.case((FraudAlert.alert_type == 'large_withdrawal', 1), else_=0),
+            epoch_seconds(FraudAlert.created_at)
+        ).where(FraudAlert.customer_id >= first_id, FraudAlert.customer_id < last_id,
+                FraudAlert.status == 'resolved')).all(), 3)
+    if not chunks:
+        return {'transactions': 0, 'rule_sets': [None] * len(rule_sets)}
+
+    columns = numpy.concatenate(chunks)
+    customer, checked, amount, balance_after, seconds = columns.T
+    checked = checked.astype(bool)
+    start = min(seconds.min(), alerts[:, 2].min()) if len(alerts) else seconds.min()
+    customers, customer_index = numpy.unique(customer, return_inverse=True)
+    keys = backtest_keys(customer_index, ((seconds - start) * 1000).astype(numpy.int64))
+    withdrawal_balance = balance_after + amount  # balance when the withdrawal was checked
+
+    # Resolved alerts of customers with no transactions in the range cannot match
+    alert_index = numpy.searchsorted(customers, alerts[:, 0])
+    known = (alert_index < len(customers)) & (customers[numpy.minimum(alert_index, len(customers) - 1)] == alerts[:, 0])
+    alert_keys = backtest_keys(alert_index[known], ((alerts[known, 2] - start) * 1000).astype(numpy.int64))
+    alert_large = alerts[known, 1].astype(bool)
+    resolved = {'large_withdrawal': numpy.sort(alert_keys[alert_large]),
+                'unusual_transaction': numpy.sort(alert_keys[~alert_large])}
+    tolerance = int(match_seconds * 1000)
+
+    results = []
+    position = numpy.arange(len(keys))
+    for ratio, window_minutes, max_count in rule_sets:
+        large = checked & (amount > withdrawal_balance * ratio)
+        # Earlier transactions of the same customer inside the window
+        window_start = numpy.searchsorted(keys, keys - int(window_minutes * 60000), side='left')
+        unusual = checked & ~large & (position - window_start > max_count)
+        result = {'customers': int(len(numpy.unique(customer_index[large | unusual])))}
+        for alert_type, flagged in (('large_withdrawal', large), ('unusual_transaction', unusual)):
+            flagged_keys = keys[flagged]  # already sorted
+            result[alert_type] = {
+                'alerts': int(flagged.sum()),
+                'matching_resolved': int(near(flagged_keys, resolved[alert_type], tolerance).sum()),
+                'resolved_found': int(near(resolved[alert_type], flagged_keys, tolerance).sum())
+            }
+        results.append(result)
+    return {'transactions': len(keys), 'rule_sets': results}
+
+def _backtest_worker_init():
+    app.app_context().push()
+    # Don't reuse connections inherited from the parent process
+    db.engine.dispose(close=False)
+
+@app.cli.group('fraud')
+def fraud_cli():
+    """Fraud rule tooling"""
+
+@fraud_cli.command('backtest')
+@click.option('--ratio', type=float, multiple=True, help='Large withdrawal share of balance; repeat to compare')
+@click.option('--window-minutes', type=float, multiple=True, help='Window of the unusual-activity rule; repeatable')
+@click.option('--max-count', type=int, multiple=True, help='Transactions allowed in the window; repeatable')
+@click.option('--customers-per-task', default=2000, show_default=True, help='Customer id range per parallel task')
+@click.option('--processes', type=int, help='Worker processes (default: one per CPU)')
+@click.option('--match-seconds', default=120.0, show_default=True,
+              help='How close a simulated alert must be to a resolved FraudAlert to count as the same')
+@click.option('--output', type=click.Path(dir_okay=False), help='Also write the results as JSON')
+def backtest_command(ratio, window_minutes, max_count, customers_per_task, processes, match_seconds, output):
+    """Replay transaction history against candidate fraud rules
+
+    Every combination of --ratio, --window-minutes and --max-count is one
+    rule set; the defaults are the live rules. Archived months are not read.
+    """
+    if numpy is None:
+        raise click.ClickException('The backtest needs numpy: pip install numpy')
+    rule_sets = [(r, w, m)
+                 for r in ratio or (FRAUD_LARGE_WITHDRAWAL_RATIO,)
+                 for w in window_minutes or (FRAUD_RECENT_WINDOW.total_seconds() / 60,)
+                 for m in max_count or (FRAUD_MAX_RECENT_TRANSACTIONS,)]
+    with db.engine.connect().execution_options(sqlite_reads_only=True) as connection:
+        low, high = connection.execute(db.select(db.func.min(Transaction.customer_id),
+                                                 db.func.max(Transaction.customer_id))).one()
+        resolved_totals = dict(connection.execute(db.select(FraudAlert.alert_type, db.func.count(FraudAlert.id))
+                                                  .where(FraudAlert.status == 'resolved')
+                                                  .group_by(FraudAlert.alert_type)).all())
+    if low is None:
+        raise click.ClickException('No transactions to replay')
+
+    start = time.time()
+    tasks = [(first, first + customers_per_task, rule_sets, match_seconds, 100000)
+             for first in range(low, high + 1, customers_per_task)]
+    transactions = 0
+    totals = [{'customers': 0,
+               'large_withdrawal': {'alerts': 0, 'matching_resolved': 0, 'resolved_found': 0},
+               'unusual_transaction': {'alerts': 0, 'matching_resolved': 0, 'resolved_found': 0}}
+              for _ in rule_sets]
+    with multiprocessing.Pool(processes, initializer=_backtest_worker_init) as pool:
+        for part in pool.imap_unordered(backtest_customer_range, tasks):
+            transactions += part['transactions']
+            for total, result in zip(totals, part['rule_sets']):
+                if result is None:
+                    continue
+                total['customers'] += result['customers']
+                for alert_type in ('large_withdrawal', 'unusual_transaction'):
+                    for key, value in result[alert_type].items():
+                        total[alert_type][key] += value
+    elapsed = time.time() - start
+
+    click.echo(f"Replayed {transactions} transactions in {elapsed:.1f}s; resolved alerts: "
+               f"{resolved_totals.get('large_withdrawal', 0)} large_withdrawal, "
+               f"{resolved_totals.get('unusual_transaction', 0)} unusual_transaction")
+    click.echo(f"{'ratio':>6}{'window':>8}{'max':>5}{'large':>9}{'unusual':>9}{'customers':>11}"
+               f"{'large hit':>11}{'unusual hit':>13}{'resolved found':>16}")
+    results = []
+    for (r, w, m), total in zip(rule_sets, totals):
+        large, unusual = total['large_withdrawal'], total['unusual_transaction']
+        found = large['resolved_found'] + unusual['resolved_found']
+        resolved = sum(resolved_totals.get(t, 0) for t in ('large_withdrawal', 'unusual_transaction'))
+        click.echo(f"{r:>6.2f}{w:>7.0f}m{m:>5}{large['alerts']:>9}{unusual['alerts']:>9}{total['customers']:>11}"
+                   f"{large['matching_resolved']:>11}{unusual['matching_resolved']:>13}{found:>10}/{resolved:<5}")
+        results.append({'ratio': r, 'window_minutes': w, 'max_count': m, **total})
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'transactions': transactions, 'resolved_alerts': resolved_totals, 'rule_sets': results}, f, indent=2)
+
+# Rate Limiting
+# Token buckets per client IP, per session user and per (session user, target
+# account). A request takes its route's cost from every bucket that applies,
+# or from none of them; a refused request gets 429 with Retry-After.
+RATE_LIMITS = {
+    # scope: (capacity, tokens refilled per second)
+    'ip': (120, 2.0),
+    'user': (120, 2.0),
+    'account': (30, 0.5)
+}
+
+# Endpoint costs; anything not listed costs 1
+RATE_LIMIT_COSTS = {
+    'login': 10,              # bcrypt
+    'register': 10,           # bcrypt
+    'verify_otp': 5,
+    'get_customers': 10,      # full table
+    'get_all_accounts': 10,   # full table
+    'search_customers_route': 2,
+    'transfer_money': 3,
+    'withdraw_money': 2,
+    'deposit_money': 2
+}
+
+class MemoryRateLimitStore:
+    """Buckets in this process only; each gunicorn worker limits separately"""
+    max_keys = 100000
+    
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+    
+    def consume(self, buckets, cost, now):
+        """Take cost from every (key, capacity, rate) bucket; return seconds to wait, 0 if allowed"""
+        with self.lock:
+            levels = []
+            wait = 0.0
+            for key, capacity, rate in buckets:
+                tokens, updated = self.buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                levels.append(tokens)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+            if wait:
+                return wait
+            for (key, _, _), tokens in zip(buckets, levels):
+                self.buckets[key] = (tokens - cost, now)
+            if len(self.buckets) > self.max_keys:
+                self.prune(now)
+            return 0.0
+    
+    def prune(self, now):
+        # A bucket idle long enough to be full again is the same as no bucket
+        capacity, rate = max(RATE_LIMITS.values(), key=lambda limit: limit[0] / limit[1])
+        idle = capacity / rate
+        self.buckets = {key: value for key, value in self.buckets.items() if now - value[1] < idle}
+
+class RedisRateLimitStore:
+    """Buckets in Redis, shared by every worker; updated atomically by a Lua script"""
+    script = """
+    local now = tonumber(ARGV[1])
+    local cost = tonumber(ARGV[2])
+    local levels = {}
+    local wait = 0
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[1 + 2 * i])
+        local rate = tonumber(ARGV[2 + 2 * i])
+        local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+        local tokens = tonumber(bucket[1]) or capacity
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+        levels[i] = tokens
+        if tokens < cost then
+            wait = math.max(wait, (cost - tokens) / rate)
+        end
+    end
+    if wait > 0 then
+        return tostring(wait)
+    end
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[1 + 2 * i])
+        local rate = tonumber(ARGV[2 + 2 * i])
+        redis.call('HSET', key, 'tokens', levels[i] - cost, 'updated', now)
+        redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+    end
+    return '0'
+    """
+    
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError('RATE_LIMIT_STORAGE_URL uses Redis but the redis package is not installed')
+        self.client = redis.Redis.from_url(url)
+        self.consume_script = self.client.register_script(self.script)
+    
+    def consume(self, buckets, cost, now):
+        args = [now, cost]
+        for _, capacity, rate in buckets:
+            args.extend([capacity, rate])
+        return float(self.consume_script(keys=[f"ratelimit:{key}" for key, _, _ in buckets], args=args))
+
+def create_rate_limit_store(url):
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        return RedisRateLimitStore(url)
+    return MemoryRateLimitStore()
+
+rate_limit_store = create_rate_limit_store(app.config['RATE_LIMIT_STORAGE_URL'])
+
+def rate_limit_buckets():
+    """Buckets that apply to the current request"""
+    endpoint = request.endpoint
+    buckets = [(f"ip:{request.remote_addr}", *RATE_LIMITS['ip'])]
+    if 'user_id' not in session:
+        # Anonymous requests are refused by login_required anyway; charging
+        # the account for them would let anyone lock its owner out
+        return buckets
+    user_id = session['user_id']
+    buckets.append((f"user:{user_id}", *RATE_LIMITS['user']))
+    if request.view_args and 'customer_id' in request.view_args:
+        buckets.append((f"account:{user_id}:{request.view_args['customer_id']}:{endpoint}", *RATE_LIMITS['account']))
+    return buckets
+
+@app.before_request
+def enforce_rate_limits():
+    if not app.config['RATE_LIMIT_ENABLED'] or request.endpoint in (None, 'static'):
+        return None
+    cost = RATE_LIMIT_COSTS.get(request.endpoint, 1)
+    wait = rate_limit_store.consume(rate_limit_buckets(), cost, time.time())
+    if wait:
+        response = jsonify({'error': 'Too many requests', 'retry_after': math.ceil(wait)})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+        return response
+    return None
+
+# SQLite Concurrency
+# Several gunicorn workers on one SQLite file. Every connection runs in WAL
+# mode so readers never block the writer, and waits up to busy_timeout for the
+# write lock instead of failing. pysqlite's implicit BEGIN is replaced by an
+# explicit one: a plain BEGIN for GET requests and BEGIN IMMEDIATE for
+# everything else (other requests, the writer thread, jobs and CLI commands),
+# so a transaction takes the write lock before it reads the rows it is about
+# to change. Such a transaction must stay short: slow work like bcrypt runs
+# outside it, and long-running readers (outbox tail, fraud backtest) ask for a
+# plain BEGIN with the sqlite_reads_only execution option. Money-moving routes
+# go through one writer thread per worker, which runs whatever is queued as
+# one transaction (a savepoint per operation) and one commit.
+SQLITE_TUNED = (app.config['SQLITE_HIGH_CONCURRENCY']
+                and app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'))
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+    f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}",
+    'PRAGMA mmap_size=268435456',  # 256 MB
+    'PRAGMA cache_size=-16000',    # 16 MB per connection
+    'PRAGMA temp_store=MEMORY'
+)
+SQLITE_WRITE_BATCH = 64
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    if not SQLITE_TUNED or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    dbapi_connection.isolation_level = None  # SQLAlchemy emits BEGIN below
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+@event.listens_for(Engine, 'begin')
+def begin_sqlite_transaction(conn):
+    if not SQLITE_TUNED or conn.dialect.name != 'sqlite':
+        return
+    reads_only = conn.get_execution_options().get('sqlite_reads_only') or \
+        (has_request_context() and request.method in ('GET', 'HEAD', 'OPTIONS'))
+    conn.exec_driver_sql('BEGIN' if reads_only else 'BEGIN IMMEDIATE')
+
+class PendingWrite:
+    __slots__ = ('fn', 'args', 'done', 'result', 'error')
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SQLiteWriter:
+    """Group commit: operations queued while a batch commits share the next commit"""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pid = None
+        self.queue = None
+
+    def submit(self, fn, *args):
+        with self.lock:
+            # Started lazily, and again in each forked worker
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.queue = queue.Queue()
+                threading.Thread(target=self.run, args=(self.queue,), daemon=True).start()
+        write = PendingWrite(fn, args)
+        self.queue.put(write)
+        write.done.wait()
+        if write.error is not None:
+            raise write.error
+        return write.result
+
+    def run(self, pending):
+        with app.app_context():
+            while True:
+                batch = [pending.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(pending.get_nowait())
+                    except queue.Empty:
+                        break
+                self.execute(batch)
+
+    def execute(self, batch):
+        try:
+            for write in batch:
+                savepoint = db.session.begin_nested()
+                try:
+                    write.result = write.fn(*write.args)
+                except Exception as e:
+                    savepoint.rollback()
+                    write.error = e
+                    continue
+                if write.result[1] >= 400:
+                    savepoint.rollback()
+                else:
+                    savepoint.commit()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for write in batch:
+                write.result, write.error = None, write.error or e
+        finally:
+            for write in batch:
+                write.done.set()
+
+sqlite_writer = SQLiteWriter(SQLITE_WRITE_BATCH) if SQLITE_TUNED else None
+
+def run_money_write(fn, *args):
+    """Run fn(*args) -> (body, status) and commit it; error statuses roll back"""
+    if sqlite_writer is not None:
+        # Release any write lock this request took (e.g. login_required's
+        # lookup) so the writer thread is not left waiting on it
+        db.session.commit()
+        return sqlite_writer.submit(fn, *args)
+    try:
+        body, status = fn(*args)
+    except Exception:
+        db.session.rollback()
+        raise
+    if status >= 400:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return body, status
+
+# Account Cache
+# Read-through cache of customer rows for get_customer, get_balance and the
+# customer dashboard. Rows a session changes (ORM flushes, plus the keys bulk
+# UPDATEs pass to mark_cache_keys_changed) are invalidated as soon as that
+# session commits. A load that overlaps an invalidation is not stored, so a
+# reader that fetched the row before a commit cannot put the old row back.
+class MemoryCacheStore:
+    """LRU with TTL in this process only; each gunicorn worker caches separately"""
+    name = 'memory'
+    
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.version = 0  # bumped by every invalidation
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+    
+    def load_token(self, key):
+        with self.lock:
+            return self.version
+    
+    def set(self, key, value, token):
+        with self.lock:
+            if token != self.version:
+                return
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def delete(self, keys):
+        with self.lock:
+            self.version += 1
+            for key in keys:
+                self.entries.pop(key, None)
+
+class RedisCacheStore:
+    """Entries in Redis, shared by every worker; each key has a generation counter bumped on delete"""
+    name = 'redis'
+    script = """
+    if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+        redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    end
+    """
+    
+    def __init__(self, url, ttl):
+        if redis is None:
+            raise RuntimeError('CACHE_URL uses Redis but the redis package is not installed')
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(url)
+        self.set_script = self.client.register_script(self.script)
+    
+    def get(self, key):
+        raw = self.client.get(f"cache:{key}")
+        return json.loads(raw) if raw is not None else None
+    
+    def load_token(self, key):
+        return (self.client.get(f"cache:gen:{key}") or b'0').decode()
+    
+    def set(self, key, value, token):
+        self.set_script(keys=[f"cache:{key}", f"cache:gen:{key}"], args=[token, dumps_json(value), self.ttl])
+    
+    def delete(self, keys):
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.incr(f"cache:gen:{key}")
+            pipe.expire(f"cache:gen:{key}", 86400)
+            pipe.delete(f"cache:{key}")
+        pipe.execute()
+
+def create_cache_store(url, ttl, max_entries):
+    if url == 'none':
+        return None
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        return RedisCacheStore(url, ttl)
+    return MemoryCacheStore(max_entries, ttl)
+
+class AccountCache:
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def get(self, key, loader):
+        """Cached value for key, else loader() (stored unless None)"""
+        if self.store is None:
+            return loader()
+        value = self.store.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        token = self.store.load_token(key)
+        value = loader()
+        if value is not None:
+            self.store.set(key, value, token)
+        return value
+    
+    def invalidate(self, keys):
+        if self.store is not None and keys:
+            self.store.delete(keys)
+            self.invalidations += len(keys)
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.store.name if self.store is not None else 'none',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'invalidations': self.invalidations
+        }
+
+account_cache = AccountCache(create_cache_store(
+    app.config['CACHE_URL'], app.config['CACHE_TTL_SECONDS'], app.config['CACHE_MAX_ENTRIES']))
+
+def mark_cache_keys_changed(keys, session=None):
+    """Invalidate keys once the session commits"""
+    (session or db.session).info.setdefault('changed_cache_keys', set()).update(keys)
+
+@event.listens_for(Session, 'after_flush')
+def collect_changed_customers(session, flush_context):
+    keys = []
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Customer):
+            keys.extend((f"customer:{obj.id}", f"user-customer:{obj.user_id}"))
+    if keys:
+        mark_cache_keys_changed(keys, session)
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_committed_customers(session):
+    if session.in_nested_transaction():
+        return  # a savepoint was released; wait for the real commit
+    account_cache.invalidate(session.info.pop('changed_cache_keys', None))
+
+@event.listens_for(Session, 'after_soft_rollback')
+def forget_rolled_back_customers(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('changed_cache_keys', None)
+
+def cached_customer(customer_id):
+    """Customer.to_dict() for customer_id, or None"""
+    def load():
+        customer = Customer.query.get(customer_id)
+        return customer.to_dict() if customer else None
+    if account_cache.store is not None:
+        # End any read transaction started earlier in the request, so the row
+        # is read in a snapshot taken after the cache's load token
+        db.session.commit()
+    return account_cache.get(f"customer:{customer_id}", load)
+
+def cached_customer_for_user(user_id):
+    def load():
+        customer_id = db.session.scalar(db.select(Customer.id).where(Customer.user_id == user_id))
+        return {'customer_id': customer_id} if customer_id is not None else None
+    if account_cache.store is not None:
+        db.session.commit()
+    mapping = account_cache.get(f"user-customer:{user_id}", load)
+    return cached_customer(mapping['customer_id']) if mapping else None
+
 # Authentication decorator
 def login_required(role=None):
     def decorator(f):
@@ -286,7 +2122,8 @@ def login_required(role=None):
             if not user or not user.is_active:
                 return jsonify({'error': 'Invalid user'}), 401
             
-            if role and user.role != role:
+            roles = role if isinstance(role, (list, tuple)) else (role,)
+            if role and user.role not in roles:
                 return jsonify({'error': 'Insufficient permissions'}), 403
             
             return f(*args, **kwargs)
@@ -344,6 +2181,10 @@ def contact_page():
 def register():
     data = request.get_json()
     
+    # Hash before the first query: in SQLite concurrency mode this request's
+    # transaction holds the write lock, and bcrypt takes a few hundred ms
+    password_hash = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+    
     # Check if user already exists
     if User.query.filter_by(email=data['email']).first():
         return jsonify({'error': 'Email already registered'}), 400
@@ -352,7 +2193,6 @@ def register():
         return jsonify({'error': 'Username already taken'}), 400
     
     # Create user
-    password_hash = bcrypt.generate_password_hash(data['password']).decode('utf-8')
     user = User(
         username=data['username'],
         email=data['email'],
@@ -404,23 +2244,28 @@ def login():
     data = request.get_json()
     
     user = User.query.filter_by(email=data['email']).first()
+    password_hash = user.password_hash if user else None
+    db.session.rollback()  # don't hold the SQLite write lock through bcrypt
     
-    if user and bcrypt.check_password_hash(user.password_hash, data['password']):
+    if user and bcrypt.check_password_hash(password_hash, data['password']):
         if not user.is_active:
             return jsonify({'error': 'Account is deactivated'}), 400
         
-        # Update last login and mark OTP as verified (skip 2FA)
-        user.last_login = datetime.utcnow()
-        user.otp_verified = True
+        # Update last login and mark OTP as verified (skip 2FA) in the background
+        now = datetime.utcnow()
+        enqueue_job('record_login', {'user_id': user.id, 'at': now.isoformat()})
         db.session.commit()
         
         # Create session
         session['user_id'] = user.id
         session['user_role'] = user.role
         
+        user_data = user.to_dict()
+        user_data['last_login'] = now.strftime('%Y-%m-%d %H:%M:%S')
+        
         return jsonify({
             'message': 'Login successful',
-            'user': user.to_dict(),
+            'user': user_data,
             'requires_2fa': False
         })
     
@@ -462,13 +2307,35 @@ def get_profile():
 # Customer Management Routes
 @app.route('/api/customers', methods=['GET'])
 def get_customers():
-    customers = Customer.query.all()
-    return jsonify([customer.to_dict() for customer in customers])
+    chunks = iter_row_dicts(select_rows(CUSTOMER_FIELDS), CUSTOMER_FIELDS)
+    return json_list_response(chunks, stream=wants_stream())
+
+@app.route('/api/customers/search', methods=['GET'])
+@login_required(role=('staff', 'admin'))
+def search_customers_route():
+    """Ranked, paginated search over name, email, phone and account number"""
+    q = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), SEARCH_MAX_PER_PAGE)
+
+    results, has_more = search_customers(q, page, per_page)
+    return jsonify({'results': results, 'page': page, 'per_page': per_page, 'has_more': has_more})
 
 @app.route('/api/customers/<int:customer_id>', methods=['GET'])
 def get_customer(customer_id):
-    customer = Customer.query.get_or_404(customer_id)
-    return jsonify(customer.to_dict())
+    customer = cached_customer(customer_id)
+    if customer is None:
+        abort(404)
+    return jsonify(customer)
+
+@app.route('/api/customers/me', methods=['GET'])
+@login_required()
+def get_my_customer():
+    """The logged-in user's own customer account"""
+    customer = cached_customer_for_user(session['user_id'])
+    if customer is None:
+        return jsonify({'error': 'Customer account not found'}), 404
+    return jsonify(customer)
 
 @app.route('/api/customers', methods=['POST'])
 def create_customer():
@@ -533,13 +2400,17 @@ def delete_customer(customer_id):
 # Transaction Routes
 @app.route('/api/customers/<int:customer_id>/deposit', methods=['POST'])
 def deposit_money(customer_id):
-    customer = Customer.query.get_or_404(customer_id)
     data = request.get_json()
     amount = float(data['amount'])
     
     if amount <= 0:
         return jsonify({'error': 'Amount must be positive'}), 400
     
+    body, status = run_money_write(apply_deposit, customer_id, amount)
+    return jsonify(body), status
+
+def apply_deposit(customer_id, amount):
+    customer = Customer.query.get_or_404(customer_id)
     customer.balance += amount
     
     transaction = Transaction(
@@ -551,25 +2422,29 @@ def deposit_money(customer_id):
     )
     
     db.session.add(transaction)
-    db.session.commit()
+    db.session.flush()
     
-    return jsonify({
+    return {
         'message': 'Deposit successful',
         'new_balance': customer.balance,
         'transaction': transaction.to_dict()
-    })
+    }, 200
 
 @app.route('/api/customers/<int:customer_id>/withdraw', methods=['POST'])
 def withdraw_money(customer_id):
-    customer = Customer.query.get_or_404(customer_id)
     data = request.get_json()
     amount = float(data['amount'])
     
     if amount <= 0:
         return jsonify({'error': 'Amount must be positive'}), 400
     
+    body, status = run_money_write(apply_withdrawal, customer_id, amount)
+    return jsonify(body), status
+
+def apply_withdrawal(customer_id, amount):
+    customer = Customer.query.get_or_404(customer_id)
     if customer.balance < amount:
-        return jsonify({'error': 'Insufficient balance'}), 400
+        return {'error': 'Insufficient balance'}, 400
     
     # Check for fraud conditions
     fraud_detected = check_fraud_conditions(customer_id, amount, 'withdraw')
@@ -585,7 +2460,7 @@ def withdraw_money(customer_id):
     )
     
     db.session.add(transaction)
-    db.session.commit()
+    db.session.flush()
     
     response_data = {
         'message': 'Withdrawal successful',
@@ -596,11 +2471,10 @@ def withdraw_money(customer_id):
     if fraud_detected:
         response_data['fraud_alert'] = 'Transaction flagged for review'
     
-    return jsonify(response_data)
+    return response_data, 200
 
 @app.route('/api/customers/<int:customer_id>/transfer', methods=['POST'])
 def transfer_money(customer_id):
-    customer = Customer.query.get_or_404(customer_id)
     data = request.get_json()
     amount = float(data['amount'])
     to_customer_id = int(data['to_customer_id'])
@@ -608,8 +2482,13 @@ def transfer_money(customer_id):
     if amount <= 0:
         return jsonify({'error': 'Amount must be positive'}), 400
     
+    body, status = run_money_write(apply_transfer, customer_id, to_customer_id, amount)
+    return jsonify(body), status
+
+def apply_transfer(customer_id, to_customer_id, amount):
+    customer = Customer.query.get_or_404(customer_id)
     if customer.balance < amount:
-        return jsonify({'error': 'Insufficient balance'}), 400
+        return {'error': 'Insufficient balance'}, 400
     
     to_customer = Customer.query.get_or_404(to_customer_id)
     
@@ -638,25 +2517,64 @@ def transfer_money(customer_id):
     
     db.session.add(from_transaction)
     db.session.add(to_transaction)
-    db.session.commit()
+    db.session.flush()
     
-    return jsonify({
+    return {
         'message': 'Transfer successful',
         'from_balance': customer.balance,
         'to_balance': to_customer.balance,
         'from_transaction': from_transaction.to_dict(),
         'to_transaction': to_transaction.to_dict()
-    })
+    }, 200
 
 @app.route('/api/customers/<int:customer_id>/transactions', methods=['GET'])
 def get_transactions(customer_id):
-    transactions = Transaction.query.filter_by(customer_id=customer_id).order_by(Transaction.created_at.desc()).limit(10).all()
-    return jsonify([transaction.to_dict() for transaction in transactions])
+    """Latest transactions of the last TRANSACTION_HISTORY_MONTHS; ?from=&to=
+    (YYYY-MM-DD) for a statement period, ?include_archived=1 to also read
+    archived months"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 1000)
+    include_archived = request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d') if request.args.get('from') else None
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    def fetch(*criteria):
+        stmt = select_rows(TRANSACTION_FIELDS, Transaction.customer_id == customer_id, *criteria,
+                           order_by=Transaction.created_at.desc()).limit(limit)
+        return [row for chunk in iter_row_dicts(stmt, TRANSACTION_FIELDS) for row in chunk]
+
+    if start is None and end is None:
+        # Bounded to recent partitions: the hot window, then (only for
+        # customers with little recent activity) the rest of the history window
+        hot_start = datetime.utcnow() - timedelta(days=TRANSACTION_HOT_DAYS)
+        rows = fetch(Transaction.created_at >= hot_start)
+        if len(rows) < limit:
+            history_start = add_months(month_start(datetime.utcnow()), -TRANSACTION_HISTORY_MONTHS)
+            rows.extend(fetch(Transaction.created_at >= history_start, Transaction.created_at < hot_start))
+            rows = rows[:limit]
+    else:
+        criteria = []
+        if start:
+            criteria.append(Transaction.created_at >= start)
+        if end:
+            criteria.append(Transaction.created_at < end)
+        rows = fetch(*criteria)
+
+    if include_archived:
+        rows.extend(read_archived_transactions(customer_id, start, end))
+        rows.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+        rows = rows[:limit]
+
+    return json_list_response([rows])
 
 @app.route('/api/customers/<int:customer_id>/balance', methods=['GET'])
 def get_balance(customer_id):
-    customer = Customer.query.get_or_404(customer_id)
-    return jsonify({'balance': customer.balance})
+    customer = cached_customer(customer_id)
+    if customer is None:
+        abort(404)
+    return jsonify({'balance': customer['balance']})
 
 # Loan Management Routes
 # @app.route('/api/loans', methods=['POST'])
@@ -714,16 +2632,18 @@ def get_balance(customer_id):
 @app.route('/api/deposits', methods=['POST'])
 @login_required()
 def create_deposit():
-    data = request.get_json()
-    
+    body, status = run_money_write(apply_create_deposit, session['user_id'], request.get_json())
+    return jsonify(body), status
+
+def apply_create_deposit(user_id, data):
     # Get customer from user
-    customer = Customer.query.filter_by(user_id=session['user_id']).first()
+    customer = Customer.query.filter_by(user_id=user_id).first()
     if not customer:
-        return jsonify({'error': 'Customer account not found'}), 404
+        return {'error': 'Customer account not found'}, 404
     
     # Check if customer has sufficient balance for FD
     if data['deposit_type'] == 'fixed' and customer.balance < data['amount']:
-        return jsonify({'error': 'Insufficient balance for fixed deposit'}), 400
+        return {'error': 'Insufficient balance for fixed deposit'}, 400
     
     # Calculate maturity amount
     maturity_amount = calculate_fd_maturity(data['amount'], data['interest_rate'], data['tenure_months'])
@@ -757,9 +2677,9 @@ def create_deposit():
         db.session.add(transaction)
     
     db.session.add(deposit)
-    db.session.commit()
+    db.session.flush()
     
-    return jsonify(deposit.to_dict()), 201
+    return deposit.to_dict(), 201
 
 @app.route('/api/deposits', methods=['GET'])
 @login_required()
@@ -775,8 +2695,8 @@ def get_deposits():
 @app.route('/api/fraud-alerts', methods=['GET'])
 @login_required(role='admin')
 def get_fraud_alerts():
-    alerts = FraudAlert.query.filter_by(status='open').order_by(FraudAlert.created_at.desc()).all()
-    return jsonify([alert.to_dict() for alert in alerts])
+    stmt = select_rows(FRAUD_ALERT_FIELDS, FraudAlert.status == 'open', order_by=FraudAlert.created_at.desc())
+    return json_list_response(iter_row_dicts(stmt, FRAUD_ALERT_FIELDS), stream=wants_stream())
 
 @app.route('/api/fraud-alerts/<int:alert_id>/resolve', methods=['POST'])
 @login_required(role='admin')
@@ -791,6 +2711,32 @@ def resolve_fraud_alert(alert_id):
     
     return jsonify({'message': 'Alert resolved successfully'})
 
+# Change Feed Routes
+@app.route('/api/outbox/events', methods=['GET'])
+def get_outbox_events():
+    """NDJSON of outbox events after ?after=<id>; X-Next-Cursor is the id to resume from"""
+    token = app.config['OUTBOX_FEED_TOKEN']
+    if not (token and secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')):
+        user = User.query.get(session['user_id']) if 'user_id' in session else None
+        if not user or not user.is_active or user.role != 'admin':
+            return jsonify({'error': 'Authentication required'}), 401
+
+    after = request.args.get('after', 0, type=int)
+    limit = min(max(request.args.get('limit', 1000, type=int), 1), OUTBOX_MAX_BATCH)
+    wait = min(max(request.args.get('wait', 0, type=float), 0), app.config['OUTBOX_MAX_WAIT_SECONDS'])
+
+    # Long poll: hold the request until events arrive or wait runs out
+    deadline = time.time() + wait
+    events = read_outbox_events(after, limit)
+    while not events and time.time() < deadline:
+        db.session.rollback()
+        time.sleep(0.5)
+        events = read_outbox_events(after, limit)
+
+    response = Response(b''.join(line for _, line in events), mimetype='application/x-ndjson')
+    response.headers['X-Next-Cursor'] = str(events[-1][0] if events else after)
+    return response
+
 # Admin Routes
 @app.route('/api/admin/pending-accounts', methods=['GET'])
 @login_required(role='admin')
@@ -821,27 +2767,52 @@ def reject_account(customer_id):
 @login_required(role='admin')
 def get_all_accounts():
     """Get all customer accounts with details"""
-    customers = Customer.query.all()
-    accounts_data = []
-    
-    for customer in customers:
-        account_data = customer.to_dict()
-        # Add user information
-        user = User.query.get(customer.user_id)
-        if user:
-            account_data['username'] = user.username
-            account_data['email'] = user.email
-            account_data['phone'] = user.phone
-            account_data['is_active'] = user.is_active
-            account_data['last_login'] = user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else None
-        
-        # Add transaction count
-        transaction_count = Transaction.query.filter_by(customer_id=customer.id).count()
-        account_data['transaction_count'] = transaction_count
-        
-        accounts_data.append(account_data)
-    
-    return jsonify(accounts_data)
+    # One query: customer columns, user columns and per-customer transaction
+    # counts instead of two extra queries per customer. Counts cover the hot
+    # window only, so they read recent partitions and don't change when old
+    # months are archived.
+    transaction_counts = db.select(
+        Transaction.customer_id, db.func.count(Transaction.id).label('transaction_count')
+    ).where(Transaction.created_at >= datetime.utcnow() - timedelta(days=TRANSACTION_HOT_DAYS)
+    ).group_by(Transaction.customer_id).subquery()
+
+    user_fields = (
+        ('username', User.username, None),
+        ('user_email', User.email, None),
+        ('user_phone', User.phone, None),
+        ('is_active', User.is_active, None),
+        ('last_login', User.last_login, format_datetime)
+    )
+    fields = CUSTOMER_FIELDS + user_fields + (
+        ('recent_transaction_count', db.func.coalesce(transaction_counts.c.transaction_count, 0), None),
+    )
+    stmt = (select_rows(fields)
+            .select_from(Customer)
+            .outerjoin(User, User.id == Customer.user_id)
+            .outerjoin(transaction_counts, transaction_counts.c.customer_id == Customer.id))
+
+    def accounts():
+        for chunk in iter_row_dicts(stmt, fields):
+            for account_data in chunk:
+                user_email = account_data.pop('user_email')
+                user_phone = account_data.pop('user_phone')
+                if account_data['username'] is None:
+                    # No linked user: keep the plain customer shape
+                    for key in ('username', 'is_active', 'last_login'):
+                        del account_data[key]
+                else:
+                    account_data['email'] = user_email
+                    account_data['phone'] = user_phone
+                account_data['recent_transaction_days'] = TRANSACTION_HOT_DAYS
+            yield chunk
+
+    return json_list_response(accounts(), stream=wants_stream())
+
+@app.route('/api/admin/cache-stats', methods=['GET'])
+@login_required(role='admin')
+def get_cache_stats():
+    """Account cache hit and miss counts for the worker that answers"""
+    return jsonify(account_cache.stats())
 
 # Admin KYC Routes
 @app.route('/api/admin/pending-kyc', methods=['GET'])
@@ -884,42 +2855,169 @@ def backfill_customers():
     # Get current last id once; account_number will be sequential as we add
     last_customer = Customer.query.order_by(Customer.id.desc()).first()
     next_id = (last_customer.id + 1) if last_customer else 1
+    created_user_ids = set()
+
+    for chunk in chunked(usernames, BULK_CHUNK_SIZE):
+        # Two set-based lookups per chunk instead of two queries per username
+        users = {user.username: user for user in User.query.filter(User.username.in_(chunk))}
+        existing = dict(db.session.execute(
+            db.select(Customer.user_id, Customer.id).where(Customer.user_id.in_([u.id for u in users.values()]))
+        ).all())
+
+        new_customers = []
+        for username in chunk:
+            user = users.get(username)
+            if not user:
+                results.append({'username': username, 'status': 'error', 'message': 'User not found'})
+                continue
+
+            if user.role != 'customer':
+                results.append({'username': username, 'status': 'skipped', 'message': 'User is not a customer'})
+                continue
+
+            if user.id in existing or user.id in created_user_ids:
+                result = {'username': username, 'status': 'skipped', 'message': 'Customer already exists'}
+                if user.id in existing:
+                    result['customer_id'] = existing[user.id]
+                results.append(result)
+                continue
+
+            account_number = f"ACC{next_id:08d}"
+            next_id += 1
+            created_user_ids.add(user.id)
+
+            new_customers.append({
+                'user_id': user.id,
+                'account_number': account_number,
+                'first_name': user.username,
+                'last_name': '',
+                'email': user.email,
+                'phone': user.phone,
+                'kyc_verified': False,
+                'account_status': 'pending'
+            })
+            results.append({'username': username, 'status': 'created', 'account_number': account_number})
+
+        if new_customers:
+            db.session.execute(db.insert(Customer), new_customers)
 
-    for username in usernames:
-        user = User.query.filter_by(username=username).first()
-        if not user:
-            results.append({'username': username, 'status': 'error', 'message': 'User not found'})
-            continue
+    db.session.commit()
 
-        if user.role != 'customer':
-            results.append({'username': username, 'status': 'skipped', 'message': 'User is not a customer'})
-            continue
+    return jsonify({'results': results})
 
-        existing = Customer.query.filter_by(user_id=user.id).first()
-        if existing:
-            results.append({'username': username, 'status': 'skipped', 'message': 'Customer already exists', 'customer_id': existing.id})
-            continue
+# Bulk Admin Routes
+# Each takes {"ids": [...]} or {"filter": {...}} and applies the change with one
+# UPDATE ... WHERE id IN (...) per chunk, reporting an outcome for every id.
+BULK_CHUNK_SIZE = 500
+
+def json_bool(value):
+    # bool("false") is True; only accept real JSON booleans
+    if not isinstance(value, bool):
+        raise ValueError('expected true or false')
+    return value
+
+CUSTOMER_BULK_FILTERS = {
+    'account_status': lambda v: Customer.account_status == v,
+    'kyc_verified': lambda v: Customer.kyc_verified == json_bool(v),
+    'created_before': lambda v: Customer.created_at < datetime.strptime(v, '%Y-%m-%d'),
+    'created_after': lambda v: Customer.created_at >= datetime.strptime(v, '%Y-%m-%d')
+}
+
+FRAUD_ALERT_BULK_FILTERS = {
+    'status': lambda v: FraudAlert.status == v,
+    'severity': lambda v: FraudAlert.severity == v,
+    'alert_type': lambda v: FraudAlert.alert_type == v,
+    'customer_id': lambda v: FraudAlert.customer_id == int(v),
+    'created_before': lambda v: FraudAlert.created_at < datetime.strptime(v, '%Y-%m-%d'),
+    'created_after': lambda v: FraudAlert.created_at >= datetime.strptime(v, '%Y-%m-%d')
+}
+
+def bulk_target_ids(model, column, value, filters):
+    """Read the ids to change from the request body; returns (ids, error response)"""
+    data = request.get_json() or {}
+    if data.get('ids') is not None:
+        ids = data['ids']
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return None, (jsonify({'error': 'ids must be a list of integers'}), 400)
+        return list(dict.fromkeys(ids)), None
+
+    criteria = data.get('filter')
+    if not isinstance(criteria, dict) or not criteria:
+        return None, (jsonify({'error': 'Provide ids as a list or a non-empty filter'}), 400)
+    unknown = set(criteria) - set(filters)
+    if unknown:
+        return None, (jsonify({'error': f"Unsupported filter fields: {', '.join(sorted(unknown))}"}), 400)
+    try:
+        conditions = [filters[key](v) for key, v in criteria.items()]
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'Invalid filter value'}), 400)
+    # Rows already in the target state would only come back as unchanged
+    ids = db.session.scalars(db.select(model.id).where(*conditions, column != value).order_by(model.id)).all()
+    return list(ids), None
+
+def bulk_set(model, column, value, ids, extra_values=None):
+    """Set column to value for ids, committing per chunk; returns per-id outcomes"""
+    results = []
+    counts = {'updated': 0, 'unchanged': 0, 'not_found': 0}
+    for chunk in chunked(ids, BULK_CHUNK_SIZE):
+        current = dict(db.session.execute(db.select(model.id, column).where(model.id.in_(chunk))).all())
+        to_update = [i for i in chunk if i in current and current[i] != value]
+        if to_update:
+            db.session.execute(
+                db.update(model).where(model.id.in_(to_update)).values({column.key: value, **(extra_values or {})}),
+                execution_options={'synchronize_session': False}
+            )
+            if model is Customer:
+                mark_cache_keys_changed(f"customer:{i}" for i in to_update)
+            if model in OUTBOX_AGGREGATES:
+                # Bulk UPDATEs skip the flush hook; record their events here
+                changed_rows = model.query.filter(model.id.in_(to_update)).populate_existing().all()
+                write_outbox_events(db.session.connection(), outbox_rows(changed_rows, 'updated', datetime.utcnow()))
+        db.session.commit()
 
-        account_number = f"ACC{next_id:08d}"
-        next_id += 1
+        changed = set(to_update)
+        for i in chunk:
+            status = 'updated' if i in changed else 'unchanged' if i in current else 'not_found'
+            counts[status] += 1
+            results.append({'id': i, 'status': status})
+    return jsonify({'results': results, **counts})
 
-        customer = Customer(
-            user_id=user.id,
-            account_number=account_number,
-            first_name=user.username,
-            last_name='',
-            email=user.email,
-            phone=user.phone,
-            kyc_verified=False,
-            account_status='pending'
-        )
+def bulk_route(model, column, value, filters, extra_values=None):
+    ids, error = bulk_target_ids(model, column, value, filters)
+    if error:
+        return error
+    return bulk_set(model, column, value, ids, extra_values() if extra_values else None)
 
-        db.session.add(customer)
-        results.append({'username': username, 'status': 'created', 'account_number': account_number})
+@app.route('/api/admin/bulk/approve-accounts', methods=['POST'])
+@login_required(role='admin')
+def bulk_approve_accounts():
+    """Approve many customer accounts"""
+    return bulk_route(Customer, Customer.account_status, 'active', CUSTOMER_BULK_FILTERS)
 
-    db.session.commit()
+@app.route('/api/admin/bulk/reject-accounts', methods=['POST'])
+@login_required(role='admin')
+def bulk_reject_accounts():
+    """Reject many customer accounts"""
+    return bulk_route(Customer, Customer.account_status, 'rejected', CUSTOMER_BULK_FILTERS)
 
-    return jsonify({'results': results})
+@app.route('/api/admin/bulk/approve-kyc', methods=['POST'])
+@login_required(role='admin')
+def bulk_approve_kyc():
+    """Approve KYC for many customers"""
+    return bulk_route(Customer, Customer.kyc_verified, True, CUSTOMER_BULK_FILTERS)
+
+@app.route('/api/admin/bulk/reject-kyc', methods=['POST'])
+@login_required(role='admin')
+def bulk_reject_kyc():
+    """Reject KYC for many customers (keeps kyc_verified as False)"""
+    return bulk_route(Customer, Customer.kyc_verified, False, CUSTOMER_BULK_FILTERS)
+
+@app.route('/api/fraud-alerts/bulk-resolve', methods=['POST'])
+@login_required(role='admin')
+def bulk_resolve_fraud_alerts():
+    """Resolve many fraud alerts"""
+    return bulk_route(FraudAlert, FraudAlert.status, 'resolved', FRAUD_ALERT_BULK_FILTERS,
+                      lambda: {'resolved_at': datetime.utcnow(), 'resolved_by': session['user_id']})
 
 # Analytics Routes
 @app.route('/api/analytics/dashboard', methods=['GET'])
@@ -941,6 +3039,48 @@ def get_analytics():
         'open_alerts': open_alerts
     })
 
+@app.route('/api/analytics/timeseries', methods=['GET'])
+@login_required(role='admin')
+def get_analytics_timeseries():
+    """Transaction volume, value and alert counts per hour or day, read from the rollups
+
+    ?granularity=day|hour, from/to (YYYY-MM-DD, inclusive), transaction_type
+    (default all types combined, * for the combined row, or 'each' for a row
+    per type), customer_id (default bank-wide)
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ROLLUP_GRANULARITIES:
+        return jsonify({'error': 'granularity must be hour or day'}), 400
+    try:
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('to') \
+            else rollup_bucket(datetime.utcnow(), 'day') + timedelta(days=1)
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d') if request.args.get('from') \
+            else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    transaction_type = request.args.get('transaction_type', '*')
+    customer_id = request.args.get('customer_id', 0, type=int)
+
+    query = TransactionRollup.query.filter(
+        TransactionRollup.granularity == granularity,
+        TransactionRollup.customer_id == customer_id,
+        TransactionRollup.bucket_start >= start,
+        TransactionRollup.bucket_start < end
+    )
+    if transaction_type == 'each':
+        query = query.filter(TransactionRollup.transaction_type != '*')
+    else:
+        query = query.filter(TransactionRollup.transaction_type == transaction_type)
+    rollups = query.order_by(TransactionRollup.bucket_start, TransactionRollup.transaction_type).all()
+
+    return jsonify({
+        'granularity': granularity,
+        'from': start.strftime('%Y-%m-%d'),
+        'to': (end - timedelta(days=1)).strftime('%Y-%m-%d'),
+        'series': [rollup.to_dict() for rollup in rollups]
+    })
+
 def create_default_admin():
     """Create default admin account if it doesn't exist"""
     admin_email = 'admin@securebank.com'
@@ -959,9 +3099,167 @@ def create_default_admin():
         db.session.commit()
         print(f"Default admin created - Email: {admin_email}, Password: admin123")
 
+# Schema Migrations
+# The schema is created and upgraded once at deploy time with
+# `flask --app app db upgrade`, never on import or on a worker's first request.
+# Each step runs once, in order, and is recorded in schema_version.
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a schema migration step"""
+    def decorator(f):
+        MIGRATIONS.append((version, description, f))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return f
+    return decorator
+
+def create_tables(*models):
+    # On the session's connection, so a migration and its schema_version row
+    # commit together and SQLite never has two writers in one process
+    db.metadata.create_all(bind=db.session.connection(), tables=[model.__table__ for model in models], checkfirst=True)
+
+@migration(1, 'Initial schema')
+def migrate_initial_schema():
+    # checkfirst makes this a no-op on databases created by the old db.create_all()
+    create_tables(User, Customer, Transaction, Loan, Deposit, FraudAlert, ContactMessage)
+
+@migration(2, 'Background job queue')
+def migrate_job_queue():
+    create_tables(Job)
+
+@migration(3, 'Customer search indexes')
+def migrate_customer_search():
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        columns = ', '.join(SQLITE_SEARCH_COLUMNS)
+        new_values = ', '.join(f'new.{c}' for c in SQLITE_SEARCH_COLUMNS)
+        old_values = ', '.join(f'old.{c}' for c in SQLITE_SEARCH_COLUMNS)
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS customer_fts USING fts5({columns}, "
+            f"content='customer', content_rowid='id', tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS customer_fts_insert AFTER INSERT ON customer BEGIN "
+            f"INSERT INTO customer_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS customer_fts_delete AFTER DELETE ON customer BEGIN "
+            f"INSERT INTO customer_fts(customer_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS customer_fts_update AFTER UPDATE OF {columns} ON customer BEGIN "
+            f"INSERT INTO customer_fts(customer_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO customer_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            "INSERT INTO customer_fts(customer_fts) VALUES ('rebuild')"
+        ]
+    elif dialect == 'postgresql':
+        statements = [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            f"CREATE INDEX IF NOT EXISTS ix_customer_search_tsv ON customer "
+            f"USING gin (to_tsvector('simple', {PG_SEARCH_TEXT}))",
+            f"CREATE INDEX IF NOT EXISTS ix_customer_search_trgm ON customer "
+            f"USING gin ({PG_SEARCH_TEXT} gin_trgm_ops)"
+        ]
+    else:
+        statements = []
+    for statement in statements:
+        db.session.execute(db.text(statement))
+
+@migration(4, 'Partition transactions by month')
+def migrate_transaction_partitions():
+    if db.engine.dialect.name != 'postgresql':
+        # No native partitioning; the (customer_id, created_at) index keeps
+        # the recent-window queries off the rest of the table
+        for index in Transaction.__table__.indexes:
+            index.create(bind=db.session.connection(), checkfirst=True)
+        return
+
+    oldest = db.session.execute(db.text('SELECT min(created_at) FROM "transaction"')).scalar()
+    statements = [
+        # Keep the id sequence when the old table is dropped
+        'ALTER SEQUENCE transaction_id_seq OWNED BY NONE',
+        'ALTER TABLE "transaction" RENAME TO transaction_unpartitioned',
+        """CREATE TABLE "transaction" (
+            id INTEGER NOT NULL DEFAULT nextval('transaction_id_seq'),
+            customer_id INTEGER NOT NULL REFERENCES customer (id),
+            transaction_type VARCHAR(20) NOT NULL,
+            amount FLOAT NOT NULL,
+            balance_after FLOAT NOT NULL,
+            description VARCHAR(200),
+            related_customer_id INTEGER REFERENCES customer (id),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            CONSTRAINT transaction_partitioned_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)""",
+        'CREATE TABLE transaction_default PARTITION OF "transaction" DEFAULT'
+    ]
+    for statement in statements:
+        db.session.execute(db.text(statement))
+    ensure_transaction_partitions(start=oldest)
+    db.session.execute(db.text(
+        'INSERT INTO "transaction" (id, customer_id, transaction_type, amount, balance_after, description, '
+        'related_customer_id, created_at) SELECT id, customer_id, transaction_type, amount, balance_after, '
+        "description, related_customer_id, COALESCE(created_at, now() AT TIME ZONE 'utc') FROM transaction_unpartitioned"))
+    db.session.execute(db.text('DROP TABLE transaction_unpartitioned'))
+    db.session.execute(db.text('ALTER SEQUENCE transaction_id_seq OWNED BY "transaction".id'))
+    db.session.execute(db.text(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_customer_created ON "transaction" (customer_id, created_at)'))
+
+@migration(5, 'Transaction rollups')
+def migrate_transaction_rollups():
+    create_tables(TransactionRollup)
+
+@migration(6, 'Transactional outbox')
+def migrate_outbox():
+    create_tables(OutboxEvent)
+
+def current_schema_version():
+    create_tables(SchemaVersion)
+    return db.session.query(db.func.max(SchemaVersion.version)).scalar() or 0
+
+def upgrade_database():
+    """Apply pending migrations and return the versions that were applied"""
+    current = current_schema_version()
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        step()
+        db.session.add(SchemaVersion(version=version, description=description))
+        db.session.commit()
+        applied.append(version)
+    return applied
+
+@app.cli.group('db')
+def database_cli():
+    """Schema migrations and bootstrap"""
+
+@database_cli.command('upgrade')
+def upgrade_command():
+    """Apply pending migrations and create the default admin"""
+    applied = upgrade_database()
+    for version, description, _ in MIGRATIONS:
+        if version in applied:
+            click.echo(f"Applied migration {version}: {description}")
+    click.echo(f"Schema is at version {current_schema_version()}")
+    ensure_transaction_partitions()
+    db.session.commit()
+    create_default_admin()
+
+@database_cli.command('version')
+def version_command():
+    """Show the current and latest schema versions"""
+    latest = MIGRATIONS[-1][0] if MIGRATIONS else 0
+    click.echo(f"Current: {current_schema_version()}, latest: {latest}")
+
+def warm_up():
+    """Do the first-request work up front; called in the gunicorn master when preload_app is on"""
+    configure_mappers()
+    for name in app.jinja_env.list_templates(filter_func=lambda n: n.endswith('.html')):
+        app.jinja_env.get_template(name)
+
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        upgrade_database()
         create_default_admin()
     
     # For production deployment on Render
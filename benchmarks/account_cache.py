@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Account read latency with the account cache off (CACHE_URL=none) and on,
+plus a freshness check across gunicorn workers.
+
+Reader threads fetch /api/customers/<id>/balance and /api/customers/<id> for
+a small set of hot accounts while writer threads deposit into them. Each
+writer reads the balance straight after every deposit and counts a stale
+read if it is lower than the new balance the deposit returned; readers count
+one if a balance goes down (there are only deposits). Requests are spread
+over all workers, so a read usually lands on a worker other than the one
+that took the deposit. Hit and miss counts come from /api/admin/cache-stats
+of whichever worker answers.
+
+memory:// runs with one worker; the script also checks that gunicorn refuses
+to start it with more. Pass --redis-url to test a shared Redis cache with all
+workers. Exits with status 1 if a read was stale or memory:// started with
+more than one worker.
+
+Usage:
+    python benchmarks/account_cache.py [--workers 3] [--readers 8] [--writers 2] [--seconds 10]
+        [--redis-url redis://localhost:6379/15]
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CUSTOMERS = 10
+
+
+def prepare_database(path):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'], cwd=ROOT, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+    script = (
+        "from app import app, db, User, Customer\n"
+        "with app.app_context():\n"
+        f"    for i in range({CUSTOMERS}):\n"
+        "        u = User(username=f'u{i}', email=f'u{i}@x.com', role='customer', phone='1', password_hash='x')\n"
+        "        db.session.add(u); db.session.flush()\n"
+        "        db.session.add(Customer(user_id=u.id, account_number=f'ACC{i + 1:08d}', first_name='A',\n"
+        "                                last_name='B', email=f'u{i}@x.com', phone='1', balance=1000.0))\n"
+        "    db.session.commit()\n"
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True)
+
+
+def get_json(opener, url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    with opener.open(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def wait_until_up(base):
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'{base}/api/customers/1/balance', timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def server_env(cache_url, db_path, port, workers):
+    return dict(os.environ,
+                DATABASE_URL=f'sqlite:///{db_path}',
+                PORT=str(port),
+                GUNICORN_WORKER_CLASS='gthread',
+                WEB_CONCURRENCY=str(workers),
+                GUNICORN_THREADS='16',
+                GUNICORN_LOG_LEVEL='critical',
+                RATE_LIMIT_ENABLED='0',
+                CACHE_URL=cache_url)
+
+
+def refuses_to_start(cache_url, db_path, port, workers):
+    """Whether gunicorn exits instead of serving with this cache and worker count"""
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=server_env(cache_url, db_path, port, workers),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        return server.wait(timeout=20) != 0
+    except subprocess.TimeoutExpired:
+        server.terminate()
+        server.wait()
+        return False
+
+
+def run(cache_url, db_path, port, workers, readers, writers, seconds):
+    env = server_env(cache_url, db_path, port, workers)
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    opener = urllib.request.build_opener()
+    latencies = []
+    counts = {'reads': 0, 'writes': 0, 'stale': 0}
+    lock = threading.Lock()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        seen = {}
+        local = []
+        stale = 0
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            customer = rng.randint(1, CUSTOMERS)
+            start = time.perf_counter()
+            if rng.random() < 0.5:
+                balance = get_json(opener, f'{base}/api/customers/{customer}/balance')['balance']
+            else:
+                balance = get_json(opener, f'{base}/api/customers/{customer}')['balance']
+            local.append(time.perf_counter() - start)
+            if balance < seen.get(customer, 0):
+                stale += 1
+            seen[customer] = balance
+        with lock:
+            latencies.extend(local)
+            counts['reads'] += len(local)
+            counts['stale'] += stale
+
+    def writer(seed):
+        rng = random.Random(seed)
+        writes = stale = 0
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            customer = rng.randint(1, CUSTOMERS)
+            new_balance = get_json(opener, f'{base}/api/customers/{customer}/deposit', {'amount': 1})['new_balance']
+            balance = get_json(opener, f'{base}/api/customers/{customer}/balance')['balance']
+            # Other writers may have deposited in between, never less
+            if balance < new_balance:
+                stale += 1
+            writes += 1
+            time.sleep(0.05)
+        with lock:
+            counts['writes'] += writes
+            counts['stale'] += stale
+
+    try:
+        wait_until_up(base)
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        admin = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        get_json(admin, f'{base}/api/login', {'email': 'admin@securebank.com', 'password': 'admin123'})
+        stats = get_json(admin, f'{base}/api/admin/cache-stats')
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    return {
+        'reads_per_s': counts['reads'] / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'writes': counts['writes'],
+        'stale': counts['stale'],
+        'hit_ratio': stats['hit_ratio']
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8769)
+    parser.add_argument('--redis-url', help='Also run with this shared cache (needs the redis package)')
+    args = parser.parse_args()
+
+    cases = [('none', args.workers), ('memory://', 1)]
+    if args.redis_url:
+        cases.append((args.redis_url, args.workers))
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'cache':<12}{'workers':>8}{'reads/s':>9}{'p50 ms':>8}{'writes':>8}{'stale':>7}{'hit ratio':>11}")
+        for i, (cache_url, workers) in enumerate(cases):
+            db_path = os.path.join(tmp, f"bench-{i}.db")
+            prepare_database(db_path)
+            r = run(cache_url, db_path, args.port, workers, args.readers, args.writers, args.seconds)
+            failures += r['stale']
+            hit_ratio = '-' if r['hit_ratio'] is None else f"{r['hit_ratio']:.1%}"
+            print(f"{cache_url.split('://')[0] + '://' if '://' in cache_url else cache_url:<12}{workers:>8}"
+                  f"{r['reads_per_s']:>9.0f}{r['p50_ms']:>8.1f}{r['writes']:>8}{r['stale']:>7}{hit_ratio:>11}")
+
+        if args.workers > 1:
+            refused = refuses_to_start('memory://', os.path.join(tmp, 'bench-0.db'), args.port, args.workers)
+            print(f"memory:// with {args.workers} workers: {'refused' if refused else 'STARTED'}")
+            if not refused:
+                failures += 1
+    sys.exit(1 if failures else 0)
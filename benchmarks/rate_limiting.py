@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Latency of a well-behaved client while another client hammers /api/login,
+with the rate limiter off and on.
+
+The abusive client sends wrong passwords for a real account, so every
+request that gets through costs a bcrypt check. With the limiter on those
+requests are refused with 429 before reaching bcrypt. Clients are told apart
+by X-Forwarded-For (TRUSTED_PROXIES=1).
+
+Usage:
+    python benchmarks/rate_limiting.py [--abusers 8] [--requests 60]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_database(path):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'], cwd=ROOT, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+    script = (
+        "from app import app, db, bcrypt, User, Customer\n"
+        "with app.app_context():\n"
+        "    for i in range(10):\n"
+        "        u = User(username=f'u{i}', email=f'u{i}@x.com', role='customer', phone='1',\n"
+        "                 password_hash=bcrypt.generate_password_hash('secret').decode())\n"
+        "        db.session.add(u); db.session.flush()\n"
+        "        db.session.add(Customer(user_id=u.id, account_number=f'ACC{i + 1:08d}', first_name='A',\n"
+        "                                last_name='B', email=f'u{i}@x.com', phone='1', balance=100.0))\n"
+        "    db.session.commit()\n"
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True)
+
+
+def request(url, ip, data=None):
+    headers = {'X-Forwarded-For': ip}
+    if data is not None:
+        headers['Content-Type'] = 'application/json'
+    req = urllib.request.Request(url, data=data, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def wait_until_up(base):
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            request(f'{base}/api/customers/1/balance', '127.0.0.1')
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def run(limiter, db_path, port, abusers, total_requests):
+    env = dict(os.environ,
+               DATABASE_URL=f'sqlite:///{db_path}',
+               PORT=str(port),
+               GUNICORN_WORKER_CLASS='gthread',
+               WEB_CONCURRENCY='1',
+               GUNICORN_THREADS='4',
+               GUNICORN_LOG_LEVEL='warning',
+               TRUSTED_PROXIES='1',
+               RATE_LIMIT_ENABLED='1' if limiter else '0')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    stop = threading.Event()
+    abuse_statuses = []
+
+    def abuse():
+        body = b'{"email": "u0@x.com", "password": "wrong"}'
+        while not stop.is_set():
+            abuse_statuses.append(request(f'{base}/api/login', '203.0.113.9', body))
+
+    try:
+        wait_until_up(base)
+        threads = [threading.Thread(target=abuse) for _ in range(abusers)]
+        for t in threads:
+            t.start()
+        time.sleep(1)
+
+        latencies = []
+        for i in range(total_requests):
+            start = time.perf_counter()
+            status = request(f'{base}/api/customers/{i % 10 + 1}/balance', '198.51.100.1')
+            latencies.append((time.perf_counter() - start, status))
+            time.sleep(0.2)
+
+        stop.set()
+        for t in threads:
+            t.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    times = sorted(t for t, _ in latencies)
+    return {
+        'p50_ms': times[len(times) // 2] * 1000,
+        'p99_ms': times[min(len(times) - 1, int(len(times) * 0.99))] * 1000,
+        'good_ok': sum(1 for _, status in latencies if status == 200),
+        'abuse_total': len(abuse_statuses),
+        'abuse_429': abuse_statuses.count(429)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--abusers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--port', type=int, default=8767)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        prepare_database(db_path)
+        print(f"{'limiter':<9}{'good p50 ms':>13}{'good p99 ms':>13}{'good 200s':>11}{'abusive':>9}{'429s':>7}")
+        for limiter in (False, True):
+            r = run(limiter, db_path, args.port, args.abusers, args.requests)
+            print(f"{'on' if limiter else 'off':<9}{r['p50_ms']:>13.1f}{r['p99_ms']:>13.1f}"
+                  f"{r['good_ok']:>8}/{args.requests:<2}{r['abuse_total']:>9}{r['abuse_429']:>7}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Rows per second of the list endpoints: ORM to_dict() + jsonify versus the
+column-row serializer in app.py. Also checks that both produce the same bytes.
+
+Usage:
+    python benchmarks/serialization.py [--rows 50000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(app_module, rows):
+    db = app_module.db
+    now = datetime.utcnow()
+    users = [{'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+              'role': 'customer', 'phone': '9876543210', 'is_active': True, 'created_at': now,
+              'last_login': now if i % 2 else None} for i in range(1, rows + 1)]
+    customers = [{'id': i, 'user_id': i, 'account_number': f'ACC{i:08d}', 'first_name': f'First{i}',
+                  'last_name': 'Last', 'email': f'user{i}@example.com', 'phone': '9876543210',
+                  'balance': i * 10.5, 'kyc_verified': bool(i % 3), 'account_status': 'active',
+                  'created_at': now - timedelta(minutes=i)} for i in range(1, rows + 1)]
+    alerts = [{'customer_id': i, 'alert_type': 'large_withdrawal', 'description': f'Large withdrawal of ₹{i}',
+               'severity': 'high', 'status': 'open', 'created_at': now - timedelta(seconds=i)}
+              for i in range(1, rows + 1)]
+    transactions = [{'customer_id': i, 'transaction_type': 'deposit', 'amount': 100.0, 'balance_after': 100.0,
+                     'description': 'Cash deposit of ₹100.0', 'created_at': now} for i in range(1, rows + 1)]
+    db.session.execute(db.insert(app_module.User), users)
+    db.session.execute(db.insert(app_module.Customer), customers)
+    db.session.execute(db.insert(app_module.FraudAlert), alerts)
+    db.session.execute(db.insert(app_module.Transaction), transactions)
+    db.session.commit()
+
+
+def orm_customers(app_module):
+    return app_module.jsonify([c.to_dict() for c in app_module.Customer.query.all()]).get_data()
+
+
+def orm_fraud_alerts(app_module):
+    alerts = app_module.FraudAlert.query.filter_by(status='open').order_by(app_module.FraudAlert.created_at.desc()).all()
+    return app_module.jsonify([a.to_dict() for a in alerts]).get_data()
+
+
+def fast(app_module, fields, *criteria, order_by=None):
+    stmt = app_module.select_rows(fields, *criteria, order_by=order_by)
+    return app_module.json_list_response(app_module.iter_row_dicts(stmt, fields)).get_data()
+
+
+def measure(fn, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        app_module.db.session.expunge_all()
+        start = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return rows / best, body
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    sys.path.insert(0, ROOT)
+    import app as app_module
+
+    print(f"JSON backend: {'orjson' if app_module.orjson else 'stdlib json'}")
+    with app_module.app.test_request_context():
+        app_module.db.create_all()
+        seed(app_module, args.rows)
+
+        cases = [
+            ('customers', lambda: orm_customers(app_module),
+             lambda: fast(app_module, app_module.CUSTOMER_FIELDS)),
+            ('fraud-alerts', lambda: orm_fraud_alerts(app_module),
+             lambda: fast(app_module, app_module.FRAUD_ALERT_FIELDS, app_module.FraudAlert.status == 'open',
+                          order_by=app_module.FraudAlert.created_at.desc())),
+        ]
+        print(f"{'endpoint':<14}{'to_dict rows/s':>16}{'fast rows/s':>14}{'speedup':>9}  same bytes")
+        for name, slow_fn, fast_fn in cases:
+            slow_rate, slow_body = measure(slow_fn, args.rows, args.repeat)
+            fast_rate, fast_body = measure(fast_fn, args.rows, args.repeat)
+            same = slow_body == fast_body
+            print(f"{name:<14}{slow_rate:>16,.0f}{fast_rate:>14,.0f}{fast_rate / slow_rate:>8.1f}x  {same}")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Compare concurrent-connection capacity of the gunicorn worker classes.
+
+For each worker class a gunicorn server is started with gunicorn.conf.py,
+a number of slow clients are parked on it (connected, headers never
+finished), and then regular requests to /api/customers are timed. Sync
+workers are held by the slow clients; gevent workers keep serving.
+
+Usage:
+    python benchmarks/serving_modes.py [--slow-clients 50] [--requests 200]
+"""
+
+import argparse
+import concurrent.futures
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_database(path):
+    """Create the schema and a few customers in a throwaway SQLite file"""
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    script = (
+        "from app import app, db, User, Customer\n"
+        "with app.app_context():\n"
+        "    db.create_all()\n"
+        "    for i in range(50):\n"
+        "        u = User(username=f'u{i}', email=f'u{i}@x.com', password_hash='x', role='customer', phone='1')\n"
+        "        db.session.add(u); db.session.flush()\n"
+        "        db.session.add(Customer(user_id=u.id, account_number=f'ACC{i + 1:08d}', first_name='A', last_name='B',\n"
+        "                                email=f'u{i}@x.com', phone='1', balance=100.0))\n"
+        "    db.session.commit()\n"
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True)
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def park_slow_clients(port, count):
+    """Open connections that send a partial request and then go quiet"""
+    sockets = []
+    for _ in range(count):
+        s = socket.create_connection(('127.0.0.1', port))
+        s.sendall(b'GET /api/customers HTTP/1.1\r\nHost: localhost\r\n')
+        sockets.append(s)
+    return sockets
+
+
+def timed_request(port):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/customers', timeout=5) as resp:
+            resp.read()
+        return time.perf_counter() - start, True
+    except Exception:
+        return time.perf_counter() - start, False
+
+
+def run_mode(worker_class, db_path, port, slow_clients, total_requests, concurrency):
+    env = dict(os.environ,
+               DATABASE_URL=f'sqlite:///{db_path}',
+               PORT=str(port),
+               GUNICORN_WORKER_CLASS=worker_class,
+               WEB_CONCURRENCY='2',
+               GUNICORN_TIMEOUT='10',
+               GUNICORN_LOG_LEVEL='warning')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(port):
+            raise RuntimeError(f'gunicorn ({worker_class}) did not start')
+        parked = park_slow_clients(port, slow_clients)
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda _: timed_request(port), range(total_requests)))
+        elapsed = time.perf_counter() - start
+
+        for s in parked:
+            s.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(r[0] for r in results if r[1])
+    ok = len(latencies)
+    return {
+        'worker_class': worker_class,
+        'ok': ok,
+        'failed': total_requests - ok,
+        'req_per_sec': ok / elapsed if elapsed else 0,
+        'p50_ms': latencies[ok // 2] * 1000 if ok else None,
+        'p99_ms': latencies[min(ok - 1, int(ok * 0.99))] * 1000 if ok else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slow-clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--modes', default='sync,gthread,gevent')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        prepare_database(db_path)
+
+        print(f"{'worker':<10}{'ok':>6}{'failed':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for mode in args.modes.split(','):
+            r = run_mode(mode, db_path, args.port, args.slow_clients, args.requests, args.concurrency)
+            p50 = f"{r['p50_ms']:.1f}" if r['p50_ms'] is not None else '-'
+            p99 = f"{r['p99_ms']:.1f}" if r['p99_ms'] is not None else '-'
+            print(f"{r['worker_class']:<10}{r['ok']:>6}{r['failed']:>8}{r['req_per_sec']:>10.1f}{p50:>10}{p99:>10}")
+
+
+if __name__ == '__main__':
+    main()
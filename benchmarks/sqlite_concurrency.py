@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Money-moving write throughput on one SQLite file shared by several gunicorn
+workers, with SQLITE_HIGH_CONCURRENCY off (stock pysqlite settings) and on
+(WAL, tuned pragmas, BEGIN IMMEDIATE and the group-commit writer).
+
+Client threads send a mix of deposits, withdrawals and transfers for a fixed
+time. Afterwards the sum of all balances is checked against what the
+successful requests should have produced; a difference means lost updates.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--workers 4] [--clients 32] [--seconds 10]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CUSTOMERS = 20
+OPENING_BALANCE = 1000000.0
+
+
+def prepare_database(path):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}', SQLITE_HIGH_CONCURRENCY='0')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'], cwd=ROOT, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+    script = (
+        "from app import app, db, User, Customer\n"
+        "with app.app_context():\n"
+        f"    for i in range({CUSTOMERS}):\n"
+        "        u = User(username=f'u{i}', email=f'u{i}@x.com', role='customer', phone='1', password_hash='x')\n"
+        "        db.session.add(u); db.session.flush()\n"
+        "        db.session.add(Customer(user_id=u.id, account_number=f'ACC{i + 1:08d}', first_name='A',\n"
+        f"                                last_name='B', email=f'u{{i}}@x.com', phone='1', balance={OPENING_BALANCE}))\n"
+        "    db.session.commit()\n"
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True)
+
+
+def post(url, body):
+    req = urllib.request.Request(url, data=json.dumps(body).encode(), headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def wait_until_up(base):
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'{base}/api/customers/1/balance', timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def run(tuned, db_path, port, workers, clients, seconds):
+    env = dict(os.environ,
+               DATABASE_URL=f'sqlite:///{db_path}',
+               PORT=str(port),
+               GUNICORN_WORKER_CLASS='gthread',
+               WEB_CONCURRENCY=str(workers),
+               GUNICORN_THREADS='8',
+               GUNICORN_LOG_LEVEL='critical',
+               RATE_LIMIT_ENABLED='0',
+               SQLITE_HIGH_CONCURRENCY='1' if tuned else '0')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    results = []
+    lock = threading.Lock()
+
+    def client(seed):
+        rng = random.Random(seed)
+        local = []
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            customer = rng.randint(1, CUSTOMERS)
+            op = rng.choice(('deposit', 'withdraw', 'transfer'))
+            if op == 'deposit':
+                body = {'amount': 100}
+            elif op == 'withdraw':
+                body = {'amount': 50}
+            else:
+                body = {'amount': 10, 'to_customer_id': customer % CUSTOMERS + 1}
+            start = time.perf_counter()
+            status = post(f'{base}/api/customers/{customer}/{op}', body)
+            local.append((op, status, time.perf_counter() - start))
+        with lock:
+            results.extend(local)
+
+    try:
+        wait_until_up(base)
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    ok = [(op, latency) for op, status, latency in results if status == 200]
+    expected = CUSTOMERS * OPENING_BALANCE + 100 * sum(op == 'deposit' for op, _ in ok) \
+        - 50 * sum(op == 'withdraw' for op, _ in ok)
+    with sqlite3.connect(db_path) as conn:
+        actual = conn.execute('SELECT SUM(balance) FROM customer').fetchone()[0]
+    latencies = sorted(latency for _, latency in ok) or [0]
+    return {
+        'ok_per_s': len(ok) / elapsed,
+        'errors': len(results) - len(ok),
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'drift': actual - expected
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8768)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, 'template.db')
+        prepare_database(template)
+        print(f"{'mode':<8}{'writes/s':>10}{'errors':>8}{'p99 ms':>9}{'balance drift':>15}")
+        for tuned in (False, True):
+            db_path = os.path.join(tmp, f'bench-{int(tuned)}.db')
+            shutil.copy(template, db_path)
+            r = run(tuned, db_path, args.port, args.workers, args.clients, args.seconds)
+            print(f"{'tuned' if tuned else 'stock':<8}{r['ok_per_s']:>10.0f}{r['errors']:>8}{r['p99_ms']:>9.0f}"
+                  f"{r['drift']:>15.2f}")
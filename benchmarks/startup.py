@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Cold start and per-worker memory of gunicorn with and without preload_app.
+
+Starts gunicorn.conf.py twice (GUNICORN_PRELOAD=0 and 1), measures the time
+until every worker has answered a request, and reads each worker's private
+and proportional memory from /proc (Linux only).
+
+Usage:
+    python benchmarks/startup.py [--workers 4]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def memory_kb(pid):
+    """Return (private, pss) in kB from smaps_rollup"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values.get('Private_Clean', 0) + values.get('Private_Dirty', 0), values.get('Pss', 0)
+
+
+def run(preload, workers, port, db_path):
+    env = dict(os.environ,
+               DATABASE_URL=f'sqlite:///{db_path}',
+               PORT=str(port),
+               WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD='1' if preload else '0',
+               GUNICORN_LOG_LEVEL='warning')
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        served = 0
+        deadline = time.time() + 30
+        # Each worker renders a template on its first request; keep going until
+        # the first request has been answered `workers` times
+        while served < workers and time.time() < deadline:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5) as resp:
+                    resp.read()
+                served += 1
+            except OSError:
+                time.sleep(0.05)
+        ready = time.perf_counter() - start
+
+        pids = worker_pids(server.pid)
+        private, pss = zip(*(memory_kb(pid) for pid in pids))
+    finally:
+        server.terminate()
+        server.wait()
+
+    return ready, sum(private) / len(private) / 1024, sum(pss) / len(pss) / 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'], cwd=ROOT, check=True,
+                       env=dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}'), stdout=subprocess.DEVNULL)
+
+        print(f"{'preload':<9}{'ready s':>9}{'private MB/worker':>19}{'PSS MB/worker':>15}")
+        for preload in (False, True):
+            ready, private, pss = run(preload, args.workers, args.port, db_path)
+            print(f"{str(preload):<9}{ready:>9.2f}{private:>19.1f}{pss:>15.1f}")
@@ -0,0 +1,69 @@
+"""
+Gunicorn configuration for the Banking Automation app.
+
+Workers and threads are sized from the CPU count and can be overridden with
+environment variables on Render:
+
+    WEB_CONCURRENCY          number of worker processes
+    GUNICORN_THREADS         threads per worker (gthread / sync workers)
+    GUNICORN_WORKER_CLASS    sync, gthread or gevent (default: sync)
+    GUNICORN_WORKER_CONNECTIONS  greenlets per gevent worker
+    GUNICORN_PRELOAD         load the app once in the master (default: on)
+
+With preload_app the master imports app.py and warms models and templates,
+and workers fork from it sharing those pages copy-on-write. The schema is
+not touched here; run `flask --app app db upgrade` at deploy time.
+"""
+
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+
+if worker_class == 'gevent':
+    # Patch before the preloaded app imports socket/threading in the master
+    from gevent import monkey
+    monkey.patch_all()
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+workers = int(os.environ.get('WEB_CONCURRENCY', cpu_count * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1 if worker_class == 'sync' else cpu_count * 2))
+
+# gevent workers hold many idle connections (slow clients, exports) in one
+# process; each one only needs a DB connection while it is actually querying
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Refuse a per-process account cache when there is more than one worker"""
+    # A worker only invalidates its own memory:// cache, so the others would
+    # keep serving the balance from before a deposit or withdrawal
+    if os.environ.get('CACHE_URL', 'none').startswith('memory://') and server.cfg.workers > 1:
+        raise RuntimeError(f"CACHE_URL=memory:// is per worker process; with {server.cfg.workers} workers "
+                           "use CACHE_URL=redis://... or none")
+
+
+def when_ready(server):
+    if preload_app:
+        from app import warm_up
+        warm_up()
+
+
+def post_fork(server, worker):
+    """Make psycopg2 cooperative so a gevent worker yields while PostgreSQL answers"""
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
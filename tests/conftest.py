@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# app.py reads its configuration on import
+TEST_DIR = tempfile.mkdtemp(prefix='banking-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DIR, 'banking.db')}"
+os.environ['TRANSACTION_ARCHIVE_DIR'] = os.path.join(TEST_DIR, 'archive')
+os.environ['CACHE_URL'] = 'memory://'
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
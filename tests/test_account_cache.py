@@ -0,0 +1,67 @@
+import pytest
+
+import app as banking
+
+@pytest.fixture(scope='module')
+def customer_id():
+    with banking.app.app_context():
+        banking.upgrade_database()
+        user = banking.User(username='cachetest', email='cachetest@example.com', password_hash='x',
+                            role='customer', phone='9000000001')
+        banking.db.session.add(user)
+        banking.db.session.flush()
+        customer = banking.Customer(user_id=user.id, account_number='CACHE0000001', first_name='Cache',
+                                    last_name='Test', email='cachetest@example.com', phone='9000000001',
+                                    balance=1000.0)
+        banking.db.session.add(customer)
+        banking.db.session.commit()
+        return customer.id
+
+@pytest.fixture
+def client():
+    return banking.app.test_client()
+
+@pytest.fixture
+def admin_client():
+    with banking.app.app_context():
+        banking.create_default_admin()
+        admin_id = banking.User.query.filter_by(role='admin').first().id
+    client = banking.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = admin_id
+        session['role'] = 'admin'
+    return client
+
+def cached_balance(client, customer_id):
+    """Read the balance twice so the second read is served from the cache"""
+    hits = banking.account_cache.hits
+    first = client.get(f'/api/customers/{customer_id}/balance').get_json()['balance']
+    second = client.get(f'/api/customers/{customer_id}/balance').get_json()['balance']
+    assert second == first
+    assert banking.account_cache.hits > hits
+    return second
+
+def test_cache_is_enabled():
+    assert banking.account_cache.store is not None
+
+def test_deposit_through_writer_invalidates_balance(client, customer_id):
+    assert banking.sqlite_writer is not None
+    balance = cached_balance(client, customer_id)
+    response = client.post(f'/api/customers/{customer_id}/deposit', json={'amount': 250})
+    assert response.status_code == 200
+    assert client.get(f'/api/customers/{customer_id}/balance').get_json()['balance'] == balance + 250
+
+def test_direct_withdrawal_invalidates_balance(client, customer_id, monkeypatch):
+    # PostgreSQL, or SQLite without SQLITE_HIGH_CONCURRENCY: committed in the request
+    monkeypatch.setattr(banking, 'sqlite_writer', None)
+    balance = cached_balance(client, customer_id)
+    response = client.post(f'/api/customers/{customer_id}/withdraw', json={'amount': 100})
+    assert response.status_code == 200
+    assert client.get(f'/api/customers/{customer_id}/balance').get_json()['balance'] == balance - 100
+
+def test_bulk_set_invalidates_customer(client, admin_client, customer_id):
+    client.get(f'/api/customers/{customer_id}')
+    assert client.get(f'/api/customers/{customer_id}').get_json()['account_status'] == 'pending'
+    response = admin_client.post('/api/admin/bulk/approve-accounts', json={'ids': [customer_id]})
+    assert response.get_json()['updated'] == 1
+    assert client.get(f'/api/customers/{customer_id}').get_json()['account_status'] == 'active'